@@ -1,20 +1,37 @@
-import requests
-from config import APP_ID, APP_SECRET
+import hashlib
+import os
+import time
 
-def select_instagram_account(user_token: str):
+import config
+from config import APP_ID, APP_SECRET, CACHE_DIR, ACCOUNTS_CACHE_TTL
+from file_utils import atomic_write_json, read_json
+from graph_client import get_client
+
+def _accounts_cache_path(user_token: str) -> str:
+    token_hash = hashlib.sha256(user_token.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"accounts_{token_hash}.json")
+
+
+def list_instagram_accounts(user_token: str, refresh: bool | None = None):
     """
-    Returns selected IG ID (string) or None.
+    Return [{'id', 'username'}, ...] for every IG account the token can manage.
+    Cached on disk per token hash for ACCOUNTS_CACHE_TTL seconds (only when every username
+    resolved); `refresh` bypasses the cache and defaults to the --refresh flag.
     """
+    if refresh is None:
+        refresh = config.RESPONSE_CACHE_REFRESH
+    cache_path = _accounts_cache_path(user_token)
+    cached = read_json(cache_path)
+    if not refresh and cached and time.time() - cached.get("fetched_at", 0) < ACCOUNTS_CACHE_TTL:
+        return cached.get("accounts", [])
+
     if not (APP_ID and APP_SECRET):
         print("APP_ID and APP_SECRET required for debug_token.")
         return None
 
     app_token = f"{APP_ID}|{APP_SECRET}"
-    resp = requests.get(
-        "https://graph.facebook.com/debug_token",
-        params={"input_token": user_token, "access_token": app_token},
-        timeout=30
-    ).json()
+    graph = get_client()
+    resp = graph.get("debug_token", params={"input_token": user_token}, access_token=app_token)
 
     data = resp.get("data", {})
     granular = data.get("granular_scopes", [])
@@ -28,15 +45,24 @@ def select_instagram_account(user_token: str):
         print("No Instagram accounts found in granular_scopes. Check permissions.")
         return None
 
-    accounts = []
-    for ig in ig_ids:
-        info = requests.get(
-            f"https://graph.facebook.com/v19.0/{ig}",
-            params={"fields": "id,username", "access_token": user_token},
-            timeout=30
-        ).json()
-        username = info.get("username", "Unknown")
-        accounts.append({"id": ig, "username": username})
+    # One ?ids= read (chunked) instead of one request per account
+    infos = graph.get_many(ig_ids, "id,username", access_token=user_token)
+    accounts = [{"id": ig, "username": (infos.get(str(ig)) or {}).get("username", "Unknown")} for ig in dict.fromkeys(ig_ids)]
+    unresolved = sum("username" not in (infos.get(str(ig)) or {}) for ig in dict.fromkeys(ig_ids))
+    if unresolved:
+        print(f"⚠️ Could not resolve {unresolved} account username(s); not caching the account list.")
+    else:
+        atomic_write_json(cache_path, {"fetched_at": time.time(), "accounts": accounts})
+    return accounts
+
+
+def select_instagram_account(user_token: str, refresh: bool | None = None):
+    """
+    Returns selected IG ID (string) or None.
+    """
+    accounts = list_instagram_accounts(user_token, refresh=refresh)
+    if not accounts:
+        return None
 
     print("\nAvailable Instagram Business Accounts:")
     for i, acct in enumerate(accounts, start=1):
@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+
+import config
+from file_utils import atomic_write_json, read_json
+from gemini_analysis import ANALYSIS_FIELDS, PROMPT_VERSION
+from gemini_uploads import get_upload_registry
+
+
+class AnalysisCache:
+    """
+    Per-file Gemini analysis results, stored in CACHE_DIR/analysis_cache.json.
+    An entry is reused only if the item_id (gemini_analysis.item_key), the uploaded file's
+    content hash, the model and the prompt version (gemini_analysis.PROMPT_VERSION) all
+    match; one entry is kept per item_id, so a changed file simply replaces it and entries
+    from another prompt version are dropped on load.
+    """
+
+    def __init__(self, path: str | None = None, model: str | None = None):
+        self.path = path or os.path.join(config.CACHE_DIR, "analysis_cache.json")
+        self.model = model or config.GEMINI_ANALYSIS_MODEL
+        entries = read_json(self.path, {}) or {}
+        self._entries = {k: v for k, v in entries.items() if v.get("key", [None])[-1] == PROMPT_VERSION}
+        self._lock = threading.Lock()
+        self._dirty = len(self._entries) != len(entries)
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, item_id, path) -> list:
+        return [str(item_id), get_upload_registry().content_hash(path), self.model, PROMPT_VERSION]
+
+    def get(self, item_id, path):
+        """Cached analysis entry for `item_id` analysed from exactly this file, or None."""
+        key = self._key(item_id, path)
+        with self._lock:
+            entry = self._entries.get(str(item_id))
+            if entry and entry["key"] == key:
+                self.hits += 1
+                return dict(entry["result"], analysis_cached=True, analysed_at=entry["analysed_at"])
+            self.misses += 1
+        return None
+
+    def put(self, item_id, path, result: dict):
+        """Store the analysis fields of a successful result (entries with an error are not cached)."""
+        if "error" in result:
+            return
+        key = self._key(item_id, path)
+        stored = {field: result.get(field) for field in ("media_id", "item_id", *ANALYSIS_FIELDS)}
+        with self._lock:
+            self._entries[str(item_id)] = {"key": key, "result": stored, "analysed_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if self._dirty:
+                atomic_write_json(self.path, self._entries)
+                self._dirty = False
+
+    def report(self) -> str:
+        return f"🗂️ Analysis cache: {self.hits} reused, {self.misses} not cached"
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> AnalysisCache:
+    """Return the process-wide AnalysisCache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnalysisCache()
+    return _cache
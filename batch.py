@@ -0,0 +1,222 @@
+"""
+Non-interactive batch runner: Business Discovery insights, outlier analysis and
+in-depth reports for many profiles in one process.
+
+    python batch.py profiles.json [--workers 3] [--steps insights,outliers,report]
+
+`profiles.json` is either a list of profiles or an object with shared defaults:
+
+    {
+      "defaults": {"n_media": 50, "multiplier": 2.0, "export_format": "csv"},
+      "profiles": ["competitor_a", {"username": "competitor_b", "n_media": 100}]
+    }
+
+A plain text file with one username (or profile URL) per line also works; the
+parameters then come from the command line. Profiles share one Graph connection
+pool and response cache. A JSON summary with per-step status and timings is
+written to `<out>/batch_summary.json`.
+"""
+import argparse
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import config
+from accounts import extract_username_from_url, list_instagram_accounts
+from exporters import EXPORT_FORMATS, EXTENSIONS
+from file_utils import atomic_write_json
+from graph_client import get_client
+from outliers import DEFAULT_THRESHOLDS
+from retry import retry_stats
+
+STEPS = ("insights", "outliers", "report")
+DEFAULTS = {"n_media": 25, "method": "mean", "export_format": "csv"}
+
+
+def load_profiles(path: str, defaults: dict | None = None) -> list:
+    """Read a batch file (JSON or one username per line) into a list of profile dicts."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    base = dict(DEFAULTS)
+
+    if path.endswith(".json") or text.lstrip()[:1] in ("[", "{"):
+        data = json.loads(text)
+        if isinstance(data, dict):
+            base.update(data.get("defaults", {}))
+            data = data.get("profiles", [])
+    else:
+        data = [line.strip() for line in text.splitlines() if line.strip() and not line.strip().startswith("#")]
+
+    # Command-line defaults beat the file's defaults; per-profile values beat both
+    base.update(defaults or {})
+    profiles = []
+    for entry in data:
+        profile = dict(base, **(entry if isinstance(entry, dict) else {"username": entry}))
+        profile["username"] = extract_username_from_url(str(profile.get("username") or ""))
+        if not profile["username"]:
+            print(f"⚠️ Skipping batch entry without a username: {entry}")
+            continue
+        if profile["export_format"] not in EXPORT_FORMATS:
+            profile["export_format"] = "csv"
+        if profile.get("multiplier") is None:
+            # No threshold anywhere: use the method's own default, as main.ask_outlier_method does
+            profile["multiplier"] = DEFAULT_THRESHOLDS.get(profile["method"], DEFAULT_THRESHOLDS["mean"])
+        profiles.append(profile)
+    return profiles
+
+
+def _resolve_ig_id(user_token: str, ig_id: str | None):
+    """IG account to query Business Discovery from: the given one, or the token's only account."""
+    if ig_id:
+        return ig_id
+    accounts = list_instagram_accounts(user_token) or []
+    if len(accounts) == 1:
+        return accounts[0]["id"]
+    names = ", ".join(f"{a['username']} ({a['id']})" for a in accounts) or "none"
+    raise SystemExit(f"❌ Pass --ig-id: the token manages {len(accounts)} Instagram accounts ({names}).")
+
+
+def _step_insights(user_token, ig_id, profile, out_dir):
+    from business_discovery import get_insights_for_profile_business_discovery
+    from exporters import export_rows
+
+    rows = get_insights_for_profile_business_discovery(user_token, ig_id, profile["username"], n=profile["n_media"])
+    if not rows:
+        raise RuntimeError("no media returned by Business Discovery")
+    path = os.path.join(out_dir, profile["username"] + "_insights" + EXTENSIONS[profile["export_format"]])
+    count = export_rows(rows, path, profile["export_format"])
+    return {"output": path, "rows": count}
+
+
+def _step_outliers(user_token, ig_id, profile, out_dir):
+    from get_outliers import get_outliers
+
+    summary = get_outliers(
+        user_token, ig_id, profile["username"], profile["n_media"], profile["multiplier"],
+        method=profile["method"], by_type=profile.get("by_type", False), window_days=profile.get("window_days"),
+    )
+    # A results file left over from an earlier run must not count as this run's output
+    if not summary["fetched"]:
+        raise RuntimeError("no posts fetched")
+    if not summary["output"]:
+        raise RuntimeError(f"no outliers analysed ({summary['outliers']} found)")
+    if summary["errors"] == summary["analysed"]:
+        raise RuntimeError(f"Gemini analysis failed for all {summary['analysed']} outliers")
+    return summary
+
+
+def _step_report(user_token, ig_id, profile, out_dir):
+    from generate_report import generate_in_depth_report
+
+    generate_in_depth_report(user_token, ig_id, profile["username"])
+    return {"output": f"outlier_media/{profile['username']}/{profile['username']}_in_depth_report.html"}
+
+
+_STEP_FUNCS = {"insights": _step_insights, "outliers": _step_outliers, "report": _step_report}
+
+
+def run_profile(user_token: str, ig_id: str, profile: dict, steps, out_dir: str) -> dict:
+    """Run `steps` for one profile; a failing step is recorded and the remaining steps are skipped."""
+    started = time.perf_counter()
+    result = {"username": profile["username"], "params": profile, "status": "ok", "steps": {}}
+    for step in steps:
+        step_started = time.perf_counter()
+        try:
+            info = _STEP_FUNCS[step](user_token, ig_id, profile, out_dir) or {}
+            result["steps"][step] = {"status": "ok", "seconds": round(time.perf_counter() - step_started, 3), **info}
+        except Exception as e:
+            tb = traceback.extract_tb(e.__traceback__)[-1]
+            result["steps"][step] = {
+                "status": "failed",
+                "seconds": round(time.perf_counter() - step_started, 3),
+                "error": f"{type(e).__name__}: {e} ({os.path.basename(tb.filename)}:{tb.lineno})",
+            }
+            result["status"] = "failed"
+            print(f"❌ @{profile['username']}: {step} failed: {e}")
+            for later in steps[steps.index(step) + 1:]:
+                result["steps"][later] = {"status": "skipped"}
+            break
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def run_batch(user_token: str, ig_id: str, profiles: list, steps=STEPS, workers: int | None = None, out_dir: str = "batch") -> dict:
+    """Process `profiles` with up to `workers` in flight and write `<out_dir>/batch_summary.json`."""
+    workers = max(1, workers or config.BATCH_PROFILES_IN_FLIGHT)
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.perf_counter()
+    results = {}
+
+    print(f"🚀 Batch: {len(profiles)} profiles, steps={','.join(steps)}, {workers} in flight")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_profile, user_token, ig_id, p, steps, out_dir): i for i, p in enumerate(profiles)}
+        for future in as_completed(futures):
+            res = future.result()
+            results[futures[future]] = res
+            icon = "✅" if res["status"] == "ok" else "❌"
+            print(f"{icon} @{res['username']} {res['status']} in {res['seconds']:.1f}s ({len(results)}/{len(profiles)})")
+
+    ordered = [results[i] for i in range(len(profiles))]
+    graph = get_client()
+    summary = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime()),
+        "steps": list(steps),
+        "workers": workers,
+        "seconds": round(time.perf_counter() - started, 3),
+        "succeeded": sum(r["status"] == "ok" for r in ordered),
+        "failed": sum(r["status"] != "ok" for r in ordered),
+        "cache": {"hits": graph.cache.hits, "misses": graph.cache.misses} if graph.cache else None,
+        "rate_limits": graph.governor.stats() if graph.governor else None,
+        "retries": retry_stats(),
+        "profiles": ordered,
+    }
+    summary_path = os.path.join(out_dir, "batch_summary.json")
+    atomic_write_json(summary_path, summary)
+    print(f"\n📋 Batch done: {summary['succeeded']} ok, {summary['failed']} failed in {summary['seconds']:.1f}s. Summary: {summary_path}")
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run insights/outliers/reports for many Instagram profiles")
+    parser.add_argument("profiles", help="JSON batch file or text file with one username per line")
+    parser.add_argument("--steps", default=",".join(STEPS), help=f"comma-separated subset of {','.join(STEPS)}")
+    parser.add_argument("--workers", type=int, default=None, help="profiles in flight (default BATCH_PROFILES_IN_FLIGHT)")
+    parser.add_argument("--ig-id", default=None, help="your IG business account id (default: the token's only account)")
+    parser.add_argument("--out", default="batch", help="folder for insight exports and batch_summary.json")
+    parser.add_argument("--n-media", type=int, default=None, help="default number of posts per profile")
+    parser.add_argument("--multiplier", type=float, default=None, help="default outlier threshold (default: the method's, see outliers.DEFAULT_THRESHOLDS)")
+    parser.add_argument("--method", choices=("mean", "mad", "percentile"), default=None, help="default outlier method")
+    parser.add_argument("--format", dest="export_format", choices=EXPORT_FORMATS, default=None, help="default insights export format")
+    parser.add_argument("--no-cache", action="store_true", help="disable the on-disk Graph API response cache")
+    parser.add_argument("--refresh", action="store_true", help="ignore cached Graph responses (fresh ones are still stored)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.no_cache:
+        config.RESPONSE_CACHE_ENABLED = False
+    config.RESPONSE_CACHE_REFRESH = args.refresh
+    if not config.ACCESS_TOKEN:
+        raise SystemExit("❌ ACCESS_TOKEN is not set (add it to .env or run main.py option 1 first).")
+
+    steps = [s.strip() for s in args.steps.split(",") if s.strip()]
+    unknown = [s for s in steps if s not in STEPS]
+    if unknown:
+        raise SystemExit(f"❌ Unknown steps: {', '.join(unknown)} (expected {', '.join(STEPS)})")
+
+    cli_defaults = {k: v for k, v in (("n_media", args.n_media), ("multiplier", args.multiplier),
+                                      ("method", args.method), ("export_format", args.export_format)) if v is not None}
+    profiles = load_profiles(args.profiles, cli_defaults)
+    if not profiles:
+        raise SystemExit("❌ No profiles in batch file.")
+
+    config.IG_ID = _resolve_ig_id(config.ACCESS_TOKEN, args.ig_id)
+    summary = run_batch(config.ACCESS_TOKEN, config.IG_ID, profiles, steps, args.workers, args.out)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,54 @@
+"""
+Benchmark: sequential vs concurrent DownloadEngine against fake CDN files.
+
+    python benchmarks/bench_downloads.py [n_carousels] [slides] [latency_s]
+
+Builds a Business-Discovery-shaped media list of carousels whose children point
+at the local stub server's /cdn/ endpoint (which sleeps `latency_s` per request
+to stand in for CDN round trips) and downloads it twice into a temp folder.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloads import DownloadEngine, _build_download_jobs  # noqa: E402
+from stub_server import start_stub_server  # noqa: E402
+
+
+def main():
+    n_carousels = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    slides = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    server, base_url = start_stub_server(latency=latency)
+
+    media_list = [
+        {
+            "id": str(10000 + m),
+            "media_type": "CAROUSEL_ALBUM",
+            "children": {"data": [
+                {"id": str(c), "media_type": "IMAGE", "media_url": f"{base_url}/cdn/{m}_{c}_{256 * 1024}.jpg"}
+                for c in range(slides)
+            ]},
+        }
+        for m in range(n_carousels)
+    ]
+    jobs = _build_download_jobs(media_list, user_token="x")
+
+    for name, workers, per_host in (("sequential", 1, 1), ("engine", None, None)):
+        with tempfile.TemporaryDirectory() as folder:
+            engine = DownloadEngine(folder, max_workers=workers, per_host=per_host)
+            start = time.perf_counter()
+            results = engine.run(jobs)
+            elapsed = time.perf_counter() - start
+        total = sum(r["bytes"] for r in results)
+        print(f"== {name}: {len(results)} files, {total / 1e6:.1f} MB in {elapsed:.2f}s "
+              f"(workers={engine.max_workers}, per_host={engine.per_host})\n")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Benchmark: outlier scoring on a long synthetic history.
+
+    python benchmarks/bench_outliers.py [n_posts]
+
+Times outliers.score_posts for every method, with a global baseline, per-media-type
+baselines and a 30-day rolling baseline, and shows how many posts each flags.
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outliers import METHODS, score_posts, select_outliers  # noqa: E402
+
+
+def synthetic_history(n, seed=11):
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    posts = []
+    for i in range(n):
+        likes = int(rng.lognormvariate(6, 0.6))
+        if rng.random() < 0.002:
+            likes *= 50  # viral
+        posts.append({
+            "id": str(i),
+            "like_count": likes,
+            "media_type": rng.choice(["IMAGE", "VIDEO", "CAROUSEL_ALBUM"]),
+            "timestamp": (start + timedelta(hours=i * 2)).strftime("%Y-%m-%dT%H:%M:%S+0000"),
+        })
+    return posts
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    posts = synthetic_history(n)
+    print(f"posts={n}")
+    for method in METHODS:
+        for label, kwargs in (("global", {}), ("by type", {"by_type": True}), ("rolling 30d", {"window_days": 30})):
+            start = time.perf_counter()
+            scores = score_posts(posts, "like_count", method, **kwargs)
+            elapsed = time.perf_counter() - start
+            flagged = int(select_outliers(scores, method).sum())
+            print(f"{method:<10} {label:<12} {elapsed * 1000:8.1f} ms  flagged={flagged}")
+
+
+if __name__ == "__main__":
+    main()
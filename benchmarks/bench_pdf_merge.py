@@ -0,0 +1,90 @@
+"""
+Benchmark: in-memory carousel -> PDF merging (the old merge_images_to_pdf) vs pdf_merge.
+
+    python benchmarks/bench_pdf_merge.py [n_carousels] [slides] [side_px]
+
+Writes `n_carousels` carousels of `slides` noisy JPEG slides (side_px x 1.25*side_px),
+then merges them three ways, each in a fresh subprocess so peak memory (max RSS) is
+comparable: legacy sequential in-memory, pdf_merge through the process pool, and a
+re-run where every PDF is skipped because its inputs did not change.
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_carousels(folder, n, slides, side):
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(3)
+    groups = []
+    for c in range(n):
+        paths = []
+        for s in range(slides):
+            path = os.path.join(folder, f"{1000000 + c}_{2000000 + s}.jpg")
+            pixels = rng.integers(0, 255, (int(side * 1.25), side, 3), dtype=np.uint8)
+            Image.fromarray(pixels).save(path, quality=90)
+            paths.append(path)
+        groups.append((paths, os.path.join(folder, f"{1000000 + c}.pdf")))
+    return groups
+
+
+def legacy(groups):
+    from PIL import Image
+
+    for paths, out in groups:
+        imgs = [Image.open(p).convert("RGB") for p in paths]
+        imgs[0].save(out.replace(".pdf", "_legacy.pdf"), save_all=True, append_images=imgs[1:])
+
+
+def pooled(groups):
+    from pdf_merge import merge_in_pool, shutdown_pool
+
+    futures = [merge_in_pool(paths, out) for paths, out in groups]
+    skipped = sum(f.result()[1] for f in futures)
+    shutdown_pool()
+    return skipped
+
+
+def run_mode(mode, folder, n, slides, side):
+    """Child process: time one variant and report (seconds, max RSS of this process + its workers)."""
+    groups = [
+        ([os.path.join(folder, f"{1000000 + c}_{2000000 + s}.jpg") for s in range(slides)], os.path.join(folder, f"{1000000 + c}.pdf"))
+        for c in range(n)
+    ]
+    start = time.perf_counter()
+    legacy(groups) if mode == "legacy" else pooled(groups)
+    elapsed = time.perf_counter() - start
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    print(f"{elapsed:.3f} {rss}")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--mode":
+        run_mode(sys.argv[2], sys.argv[3], *map(int, sys.argv[4:7]))
+        return
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    slides = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    side = int(sys.argv[3]) if len(sys.argv) > 3 else 1440
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_carousels(tmp, n, slides, side)
+        print(f"carousels={n} slides={slides} slide={side}x{int(side * 1.25)}px")
+        for label, mode in (("legacy in-memory", "legacy"), ("pdf_merge pool", "pooled"), ("pdf_merge re-run", "pooled")):
+            out = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, tmp, str(n), str(slides), str(side)],
+                capture_output=True, text=True, check=True,
+            ).stdout.split()
+            seconds, rss_kb = float(out[0]), int(out[1])
+            print(f"{label:<18} {seconds:7.2f} s   peak RSS per process {rss_kb / 1024:7.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark: sequential ffprobe (the old get_video_duration loop) vs media_probe.MediaProbe.
+
+    python benchmarks/bench_probe.py [n_videos] [seconds_each]
+
+Generates `n_videos` short test clips with ffmpeg in a temp folder, then times one
+ffprobe per file in sequence, a cold concurrent MediaProbe.probe_many and a warm
+re-run served from the probe cache. Needs ffmpeg/ffprobe on PATH.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from media_probe import MediaProbe  # noqa: E402
+
+
+def make_clip(path, seconds):
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", f"testsrc=size=320x568:rate=30:duration={seconds}",
+         "-f", "lavfi", "-i", f"sine=duration={seconds}", "-shortest", "-c:v", "libx264", "-preset", "ultrafast", path],
+        check=True,
+    )
+
+
+def sequential_durations(paths):
+    for path in paths:
+        subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+            capture_output=True, text=True, timeout=30,
+        )
+
+
+def main():
+    if not (shutil.which("ffmpeg") and shutil.which("ffprobe")):
+        print("ffmpeg/ffprobe not found on PATH; install them to run this benchmark.")
+        return
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 120
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 2
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f"{1000000 + i}.mp4") for i in range(n)]
+        with ThreadPoolExecutor() as pool:
+            list(pool.map(lambda p: make_clip(p, seconds), paths))
+
+        start = time.perf_counter()
+        sequential_durations(paths)
+        sequential = time.perf_counter() - start
+
+        probe = MediaProbe(path=os.path.join(tmp, "probe_cache.json"))
+        start = time.perf_counter()
+        probe.probe_many(paths)
+        cold = time.perf_counter() - start
+
+        warm_probe = MediaProbe(path=probe.path)
+        start = time.perf_counter()
+        warm_probe.probe_many(paths)
+        warm = time.perf_counter() - start
+
+    print(f"videos={n}")
+    print(f"sequential ffprobe:     {sequential:7.2f} s")
+    print(f"MediaProbe (cold):      {cold:7.2f} s  ({sequential / cold:.1f}x, {probe.max_workers} workers)")
+    print(f"MediaProbe (cached):    {warm:7.3f} s  (hits={warm_probe.hits}, misses={warm_probe.misses})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark: CLI startup cost, measured with `python -X importtime`.
+
+    python benchmarks/bench_startup.py [runs]
+
+Imports `main` (what the menu needs before it can show) and then the module set
+each menu action loads on demand, each in a fresh interpreter, and reports the
+median cumulative import time plus the slowest modules behind it.
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What each scenario imports; main itself must stay light
+SCENARIOS = {
+    "menu (import main)": "import main",
+    "3. post insights": "import main, insights, exporters",
+    "4/6. downloads": "import main, downloads",
+    "8. outliers": "import main, get_outliers",
+    "9. report": "import main, generate_report",
+}
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times(code):
+    """
+    Run `code` under -X importtime; returns (total µs, {module: cumulative µs}) for the
+    modules `code` imports itself (interpreter startup such as `site` is left out),
+    or None if an import fails (missing optional dependency).
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None
+    wanted = {name.strip() for name in code.replace("import", "", 1).split(",")}
+    top = {}
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match and len(match.group(3)) == 1 and match.group(4) in wanted:
+            top[match.group(4)] = int(match.group(2))
+    return sum(top.values()), top
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for label, code in SCENARIOS.items():
+        samples = [import_times(code) for _ in range(runs)]
+        if None in samples:
+            print(f"{label:<22} skipped (an import failed; is every dependency installed?)")
+            continue
+        total = statistics.median(t for t, _ in samples)
+        _, top = samples[-1]
+        heaviest = sorted(top.items(), key=lambda kv: kv[1], reverse=True)[:3]
+        detail = ", ".join(f"{name} {us / 1000:.0f} ms" for name, us in heaviest)
+        print(f"{label:<22} {total / 1000:8.1f} ms   ({detail})")
+
+
+if __name__ == "__main__":
+    main()
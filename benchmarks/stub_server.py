@@ -0,0 +1,63 @@
+"""
+Local stub HTTP server used by the benchmarks.
+Answers every GET with a small Graph-like JSON body, except paths under /cdn/
+which serve deterministic fake media files (size taken from the file name, e.g.
+/cdn/123_4096.jpg -> 4096 bytes) and honour `Range: bytes=N-` requests with a 206.
+`range_mode` makes /cdn/ misbehave the way some CDNs do: "ignore" answers ranged
+requests with the whole file (200), "misaligned" with a 206 that starts at byte 0.
+Keep-alive (HTTP/1.1) is supported so pooled and non-pooled clients can be
+compared fairly.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.0
+    range_mode = "honour"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        path = self.path.split("?", 1)[0]
+        if path.startswith("/cdn/"):
+            match = re.search(r"_(\d+)\.\w+$", path)
+            size = int(match.group(1)) if match else 1024
+            body = bytes(i % 251 for i in range(size))
+            rng = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+            if rng and int(rng.group(1)) < size and self.range_mode != "ignore":
+                start = int(rng.group(1)) if self.range_mode == "honour" else 0
+                self._send(206, body[start:], content_type="application/octet-stream",
+                           headers={"Content-Range": f"bytes {start}-{size - 1}/{size}"})
+                return
+            self._send(200, body, content_type="application/octet-stream")
+            return
+        body = json.dumps({"id": path.rsplit("/", 1)[-1] or "0", "username": "stub"}).encode()
+        self._send(200, body)
+
+
+def start_stub_server(latency: float = 0.0, range_mode: str = "honour"):
+    """Start the stub server on a free localhost port. Returns (server, base_url)."""
+    handler = type("StubHandler", (_Handler,), {"latency": latency, "range_mode": range_mode})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}"
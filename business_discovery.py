@@ -1,59 +1,92 @@
-import requests
+import time
 
-import requests
-from time import sleep
+import config
+from graph_client import get_client, describe_error
+from retry import classify_graph_result, too_much_data
 
-import requests
-from time import sleep
+# Media field projections for Business Discovery; request only what the caller uses.
+# get_outliers needs BD_FULL_FIELDS even for its baseline: media of other accounts cannot be
+# re-read by id, so a pick's URLs/children must come with the page that scored it.
+BD_DOWNLOAD_FIELDS = "id,media_type,media_url,thumbnail_url,children{id,media_type,media_url,thumbnail_url}"
+BD_FULL_FIELDS = (
+    "id,caption,media_type,media_url,thumbnail_url,permalink,timestamp,"
+    "like_count,comments_count,view_count,"
+    "children{id,media_type,media_url,thumbnail_url,permalink}"
+)
 
-def get_ig_id_from_username_business_discovery(
+# Largest page Graph accepted per field set after a "reduce the amount of data" error, and the
+# monotonic time that ceiling expires: {fields: (ceiling, expires_at)}
+_ceilings = {}
+# Page sizes a profile was last read with, so repeating the read asks for the same pages and hits
+# the response cache: {(username, fields): (expires_at, {after cursor: limit})}
+_page_limits = {}
+
+
+def _too_much_data(error: dict) -> bool:
+    """Graph's "Please reduce the amount of data you're asking for" (or a timeout) -> smaller pages."""
+    err = error.get("error") or {}
+    return too_much_data(error) or "Timeout" in str(err.get("type", ""))
+
+
+def _classify_page(result) -> tuple:
+    """Retry classification for a page read: errors answered by halving the page are not retried."""
+    if _too_much_data(result[0]):
+        return False, None
+    return classify_graph_result(result)
+
+
+def iter_business_discovery_pages(
     username: str,
     ig_id: str,
     user_token: str,
     n: int = 100,
-    version: str = "v24.0",
+    fields: str = BD_FULL_FIELDS,
 ):
     """
-    Fetch up to `n` media for a given username via Business Discovery.
-    Handles pagination (50 media max per request).
-    Returns: (target_ig_id, media_list)
+    Yield (target_ig_id, media_page) for up to `n` media of `username` via Business Discovery,
+    one page at a time as soon as each page arrives.
+    `fields` is the media field projection (BD_DOWNLOAD_FIELDS, BD_FULL_FIELDS or any
+    Graph field list). The page size adapts: every read starts at BD_PAGE_SIZE, doubles up
+    to BD_MAX_PAGE_SIZE while pages come back within BD_FAST_SECONDS and halves when Graph
+    asks to reduce the data. Only the halving is remembered across reads (for BD_CEILING_TTL
+    seconds); a repeated read of the same profile reuses its page sizes while those pages
+    can still be in the response cache.
     """
 
-    base_url = f"https://graph.facebook.com/{version}/{ig_id}"
-    all_media = []
+    graph = get_client()
+    collected = 0
     after = None
     target_ig_id = None
+    now = time.monotonic()
+    ceiling, expires_at = _ceilings.get(fields, (config.BD_MAX_PAGE_SIZE, now))
+    if expires_at <= now:
+        ceiling = config.BD_MAX_PAGE_SIZE
+    page_size = min(config.BD_PAGE_SIZE, ceiling)
+    plan_expires_at, plan = _page_limits.get((username, fields), (now, {}))
+    used = dict(plan) if plan_expires_at > now else {}
 
     print(f"🔍 Starting Business Discovery for @{username} (limit={n})")
 
-    while len(all_media) < n:
-        limit = min(25, n - len(all_media))
+    while collected < n:
+        limit = min(used.get(after, page_size), ceiling, n - collected)
         print(f"\n➡️ Fetching next batch (limit={limit}, after={after})...")
 
-        # Build fields with optional pagination cursor
+        # Profile fields are only needed once; later pages just follow the media cursor
         media_pagination = f"media.limit({limit})" + (f".after({after})" if after else "")
-        fields = (
-            f"business_discovery.username({username})" + "{"
-            "id,username,followers_count,media_count,"
-            f"{media_pagination}{{"
-            "id,caption,media_type,media_url,thumbnail_url,permalink,timestamp,"
-            "like_count,comments_count,view_count,"
-            "children{id,media_type,media_url,thumbnail_url,permalink}"
-            "}}"
-        )
-
-        params = {"fields": fields, "access_token": user_token}
-
-        try:
-            resp = requests.get(base_url, params=params, timeout=30)
-            data = resp.json()
-        except Exception as e:
-            print(f"❌ Failed to call or parse response from Graph API: {e}")
-            break
+        profile_fields = "id" if after else "id,username,followers_count,media_count"
+        bd_fields = f"business_discovery.username({username}){{{profile_fields},{media_pagination}{{{fields}}}}}"
 
+        started = time.perf_counter()
+        data = graph.get(ig_id, params={"fields": bd_fields}, access_token=user_token, classify_result=_classify_page)
+        elapsed = time.perf_counter() - started
         if "error" in data:
-            err = data["error"]
-            print(f"⚠️ API Error {err.get('code')} ({err.get('type')}): {err.get('message')}")
+            if _too_much_data(data) and limit > 1:
+                # Don't grow back to a size Graph rejected until the ceiling expires
+                page_size = ceiling = max(1, limit // 2)
+                _ceilings[fields] = (ceiling, time.monotonic() + config.BD_CEILING_TTL)
+                print(f"📉 Graph asked for less data; retrying with pages of {page_size}.")
+                continue
+            print(f"⚠️ API Error {describe_error(data)}")
             break
 
         bd = data.get("business_discovery")
@@ -63,27 +96,50 @@ def get_ig_id_from_username_business_discovery(
 
         # Extract IG ID and media list
         target_ig_id = bd.get("id", target_ig_id)
-        media_data = bd.get("media", {}).get("data", [])
-        print(f"📸 Retrieved {len(media_data)} media items in this batch.")
+        media_data = bd.get("media", {}).get("data", [])[:n - collected]
+        print(f"📸 Retrieved {len(media_data)} media items in this batch ({elapsed:.2f}s).")
 
         if not media_data:
             print("⚠️ No more media data available.")
             break
 
-        all_media.extend(media_data)
-        print(f"✅ Total collected so far: {len(all_media)} / {n}")
+        collected += len(media_data)
+        used[after] = limit
+        _page_limits[(username, fields)] = (time.monotonic() + config.CACHE_TTL_MEDIA, used)
+        print(f"✅ Total collected so far: {collected} / {n}")
+        yield target_ig_id, media_data
+
+        if limit >= page_size and elapsed < config.BD_FAST_SECONDS and limit < ceiling:
+            page_size = min(ceiling, limit * 2)
 
         # Pagination
         paging = bd.get("media", {}).get("paging", {})
         after = paging.get("cursors", {}).get("after")
         if after:
+            # No fixed delay: the Graph client's rate-limit governor paces calls from usage headers
             print(f"🔁 Pagination cursor found: {after}")
-            sleep(0.3)  # small delay to respect rate limits
         else:
             print("⛔ No next page. Reached the end of available media.")
             break
 
-    media_list = all_media[:n]
+
+def get_ig_id_from_username_business_discovery(
+    username: str,
+    ig_id: str,
+    user_token: str,
+    n: int = 100,
+    fields: str = BD_FULL_FIELDS,
+):
+    """
+    Fetch up to `n` media for a given username via Business Discovery.
+    Handles pagination (adaptive page size) and requests only `fields` per media.
+    Returns: (target_ig_id, media_list)
+    """
+    target_ig_id = None
+    media_list = []
+    for target_ig_id, page in iter_business_discovery_pages(username, ig_id, user_token, n=n, fields=fields):
+        media_list.extend(page)
+
     print(f"\n🎯 Done. Fetched {len(media_list)} media items for @{username}.")
     return target_ig_id, media_list
 
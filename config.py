@@ -10,3 +10,108 @@ REDIRECT_URI = os.getenv("REDIRECT_URI", "https://google.com/")
 # runtime values (main will update these)
 ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
 IG_ID = None
+
+# Graph API client settings (shared by every module that talks to Graph)
+GRAPH_API_VERSION = os.getenv("GRAPH_API_VERSION", "v24.0")
+GRAPH_API_BASE = os.getenv("GRAPH_API_BASE", "https://graph.facebook.com")
+GRAPH_POOL_SIZE = int(os.getenv("GRAPH_POOL_SIZE", "10"))
+GRAPH_TIMEOUT = float(os.getenv("GRAPH_TIMEOUT", "30"))
+
+# Graph rate-limit governor (rate_limit.py): token buckets paced by X-App-Usage /
+# X-Business-Use-Case-Usage; slows down above SOFT_PCT usage, pauses at HARD_PCT
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") not in ("0", "false", "False")
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "20"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_SOFT_PCT = float(os.getenv("RATE_LIMIT_SOFT_PCT", "60"))
+RATE_LIMIT_HARD_PCT = float(os.getenv("RATE_LIMIT_HARD_PCT", "95"))
+# Throttled calls are retried after the pause if it is at most RATE_LIMIT_MAX_WAIT seconds
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "300"))
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "3"))
+
+# Business Discovery paging: start size, API max, and "fast" response time that grows pages
+BD_PAGE_SIZE = int(os.getenv("BD_PAGE_SIZE", "25"))
+BD_MAX_PAGE_SIZE = int(os.getenv("BD_MAX_PAGE_SIZE", "100"))
+BD_FAST_SECONDS = float(os.getenv("BD_FAST_SECONDS", "2.0"))
+# Seconds a page size Graph rejected ("reduce the amount of data") keeps capping later reads
+BD_CEILING_TTL = float(os.getenv("BD_CEILING_TTL", "600"))
+
+# Media downloads
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "8"))
+DOWNLOAD_PER_HOST = int(os.getenv("DOWNLOAD_PER_HOST", "4"))
+
+# media_probe.py: concurrent ffprobe processes and per-file timeout (results cached in CACHE_DIR)
+PROBE_WORKERS = int(os.getenv("PROBE_WORKERS", "8"))
+PROBE_TIMEOUT = float(os.getenv("PROBE_TIMEOUT", "30"))
+
+# Carousel -> PDF merging (pdf_merge.py): longest slide side in pixels (0 keeps the original),
+# page DPI, JPEG quality, and merge processes (0 = one per CPU)
+PDF_MAX_SIDE = int(os.getenv("PDF_MAX_SIDE", "2048"))
+PDF_DPI = float(os.getenv("PDF_DPI", "150"))
+PDF_JPEG_QUALITY = int(os.getenv("PDF_JPEG_QUALITY", "85"))
+PDF_MERGE_WORKERS = int(os.getenv("PDF_MERGE_WORKERS", "0"))
+
+# Pre-upload optimisation (media_optimize.py): images are downscaled/re-encoded, videos
+# transcoded to a small H.264 proxy and clipped to their first MAX_UPLOAD_VIDEO_SECONDS
+OPTIMIZE_UPLOADS = os.getenv("OPTIMIZE_UPLOADS", "1") not in ("0", "false", "False")
+MAX_UPLOAD_VIDEO_SECONDS = float(os.getenv("MAX_UPLOAD_VIDEO_SECONDS", "180"))
+UPLOAD_IMAGE_MAX_SIDE = int(os.getenv("UPLOAD_IMAGE_MAX_SIDE", "1536"))
+UPLOAD_IMAGE_QUALITY = int(os.getenv("UPLOAD_IMAGE_QUALITY", "85"))
+UPLOAD_VIDEO_MAX_HEIGHT = int(os.getenv("UPLOAD_VIDEO_MAX_HEIGHT", "720"))
+UPLOAD_VIDEO_FPS = int(os.getenv("UPLOAD_VIDEO_FPS", "15"))
+UPLOAD_VIDEO_CRF = int(os.getenv("UPLOAD_VIDEO_CRF", "28"))
+UPLOAD_TRANSCODE_TIMEOUT = float(os.getenv("UPLOAD_TRANSCODE_TIMEOUT", "600"))
+
+# Gemini Files API uploads (gemini_uploads.py): identical content is reused while it has at
+# least GEMINI_UPLOAD_REUSE_MARGIN seconds left; GEMINI_UPLOAD_CLEANUP is "keep" (uploads
+# expire on their own after 48 h) or "after_run" (delete a run's uploads once it finishes)
+GEMINI_UPLOAD_REUSE_MARGIN = int(os.getenv("GEMINI_UPLOAD_REUSE_MARGIN", str(60 * 60)))
+GEMINI_UPLOAD_CLEANUP = os.getenv("GEMINI_UPLOAD_CLEANUP", "keep")
+# Waiting for uploads to become ACTIVE: overall deadline, poll backoff bounds (seconds), and
+# how many pending files switch polling from files.get per file to one files.list sweep
+GEMINI_ACTIVATION_DEADLINE = float(os.getenv("GEMINI_ACTIVATION_DEADLINE", "900"))
+GEMINI_POLL_BASE = float(os.getenv("GEMINI_POLL_BASE", "1"))
+GEMINI_POLL_MAX = float(os.getenv("GEMINI_POLL_MAX", "15"))
+GEMINI_LIST_THRESHOLD = int(os.getenv("GEMINI_LIST_THRESHOLD", "3"))
+
+# Gemini media analysis (gemini_analysis.py): model, shard limits (files / MB per call) and
+# how many shards run at once
+GEMINI_ANALYSIS_MODEL = os.getenv("GEMINI_ANALYSIS_MODEL", "gemini-2.5-pro")
+GEMINI_SHARD_FILES = int(os.getenv("GEMINI_SHARD_FILES", "8"))
+GEMINI_SHARD_MB = int(os.getenv("GEMINI_SHARD_MB", "200"))
+GEMINI_ANALYSIS_WORKERS = int(os.getenv("GEMINI_ANALYSIS_WORKERS", "4"))
+
+# get_outliers streaming pipeline (max items buffered between stages)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+
+# Local on-disk caches
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+ACCOUNTS_CACHE_TTL = int(os.getenv("ACCOUNTS_CACHE_TTL", str(24 * 3600)))
+
+# Graph response cache (SQLite in CACHE_DIR); main.py --no-cache / --refresh override these
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") not in ("0", "false", "False")
+RESPONSE_CACHE_REFRESH = False
+RESPONSE_CACHE_MAX_MB = int(os.getenv("RESPONSE_CACHE_MAX_MB", "200"))
+CACHE_TTL_PROFILE = int(os.getenv("CACHE_TTL_PROFILE", str(24 * 3600)))
+CACHE_TTL_MEDIA = int(os.getenv("CACHE_TTL_MEDIA", str(15 * 60)))
+CACHE_TTL_INSIGHTS = int(os.getenv("CACHE_TTL_INSIGHTS", str(60 * 60)))
+
+# Incremental post-insights sync: posts younger than this are still refreshed
+INSIGHTS_MOVING_WINDOW_DAYS = int(os.getenv("INSIGHTS_MOVING_WINDOW_DAYS", "28"))
+MEDIA_PAGE_SIZE = int(os.getenv("MEDIA_PAGE_SIZE", "100"))
+
+# batch.py: profiles processed concurrently (they share the Graph connection pool and cache)
+BATCH_PROFILES_IN_FLIGHT = int(os.getenv("BATCH_PROFILES_IN_FLIGHT", "3"))
+
+# Transient failures (429/5xx/timeouts/Graph codes 1 and 2) are retried with decorrelated-jitter
+# backoff between RETRY_BASE_DELAY and RETRY_MAX_DELAY seconds, for at most RETRY_ATTEMPTS
+# attempts and until the per-service deadline (RETRY_GRAPH_DEADLINE etc., else RETRY_DEADLINE).
+# RETRY_BREAKER_FAILURES consecutive failures open that service's circuit for RETRY_BREAKER_RESET seconds.
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "5"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "30"))
+RETRY_DEADLINE = float(os.getenv("RETRY_DEADLINE", "120"))
+RETRY_GRAPH_DEADLINE = float(os.getenv("RETRY_GRAPH_DEADLINE", "120"))
+RETRY_DOWNLOAD_DEADLINE = float(os.getenv("RETRY_DOWNLOAD_DEADLINE", "300"))
+RETRY_GEMINI_DEADLINE = float(os.getenv("RETRY_GEMINI_DEADLINE", "600"))
+RETRY_BREAKER_FAILURES = int(os.getenv("RETRY_BREAKER_FAILURES", "8"))
+RETRY_BREAKER_RESET = float(os.getenv("RETRY_BREAKER_RESET", "60"))
@@ -1,165 +1,240 @@
 import os
-import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
 
-from business_discovery import get_ig_id_from_username_business_discovery
+import config
+from graph_client import get_client
+from media_store import MediaStore
+from retry import get_policy
+
+from business_discovery import BD_DOWNLOAD_FIELDS, get_ig_id_from_username_business_discovery
 from accounts import extract_username_from_url
 
 
 def _fetch_children(media_id: str, user_token: str):
     """
     Return list of child dicts with keys: {'id','media_type','media_url'}.
-    Tries parent.children, then per-child node requests, then /{media_id}/children fallback.
     """
-    try:
-        resp = requests.get(
-            f"https://graph.facebook.com/v19.0/{media_id}",
-            params={"fields": "children{ id,media_type,media_url,thumbnail_url }", "access_token": user_token},
-            timeout=30
-        ).json()
-    except Exception:
-        resp = {}
-
-    children = resp.get("children", {}).get("data", []) or []
-    enriched = []
-    for child in children:
-        child_id = child.get("id")
-        media_url = child.get("media_url")
-        media_type = (child.get("media_type") or "").upper()
-        if not media_url and child_id:
-            try:
-                c = requests.get(
-                    f"https://graph.facebook.com/v19.0/{child_id}",
-                    params={"fields": "media_type,media_url,thumbnail_url", "access_token": user_token},
-                    timeout=30
-                ).json()
-                media_url = c.get("media_url") or c.get("thumbnail_url")
-                media_type = (c.get("media_type") or media_type).upper()
-            except Exception:
-                pass
-        enriched.append({"id": child_id, "media_type": media_type, "media_url": media_url})
-
-    if not enriched:
-        try:
-            resp2 = requests.get(
-                f"https://graph.facebook.com/v19.0/{media_id}/children",
-                params={"fields": "id,media_type", "access_token": user_token},
-                timeout=30
-            ).json()
-            list_children = resp2.get("data", []) or []
-            for ch in list_children:
-                cid = ch.get("id")
-                c_media_type = (ch.get("media_type") or "").upper()
-                c_media_url = None
-                if cid:
-                    try:
-                        c = requests.get(
-                            f"https://graph.facebook.com/v19.0/{cid}",
-                            params={"fields": "media_url,thumbnail_url,media_type", "access_token": user_token},
-                            timeout=30
-                        ).json()
-                        c_media_url = c.get("media_url") or c.get("thumbnail_url")
-                        c_media_type = (c.get("media_type") or c_media_type).upper()
-                    except Exception:
-                        pass
-                enriched.append({"id": cid, "media_type": c_media_type, "media_url": c_media_url})
-        except Exception:
-            pass
-
-    return enriched
+    return _fetch_children_many([media_id], user_token).get(str(media_id), [])
 
 
-def download_last_n_media(user_token: str, ig_id: str, n: int = 10, folder: str = "media"):
+def _fetch_children_many(media_ids, user_token: str) -> dict:
     """
-    Download the last n media (including carousel children) for the given IG account (owned media).
+    Resolve carousel children for several parents at once.
+    Returns {media_id: [{'id','media_type','media_url'}, ...]}.
+    All parents' children{...} come from one `?ids=` read; parents that return none fall
+    back to /{media_id}/children; children still missing media_url are then resolved
+    together in a single `?ids=` read instead of one request per child.
     """
-    if not user_token or not ig_id:
-        print("Missing token or ig_id.")
-        return
+    graph = get_client()
+    parents = graph.get_many(media_ids, "children{id,media_type,media_url,thumbnail_url}", access_token=user_token)
 
-    media_resp = requests.get(
-        f"https://graph.facebook.com/v19.0/{ig_id}/media",
-        params={"fields": "id,media_type,media_url,children{ id,media_type,media_url }", "limit": n, "access_token": user_token},
-        timeout=60
-    ).json()
-    media_list = media_resp.get("data", [])
-    if not media_list:
-        print("No media found.")
+    children_by_parent = {}
+    for media_id in map(str, media_ids):
+        parent = parents.get(media_id) or {}
+        children = (parent.get("children") or {}).get("data", []) or []
+        if not children and "error" not in parent:
+            resp = graph.get(f"{media_id}/children", params={"fields": "id,media_type"}, access_token=user_token)
+            children = resp.get("data", []) or []
+        children_by_parent[media_id] = [
+            {"id": c.get("id"), "media_type": (c.get("media_type") or "").upper(), "media_url": c.get("media_url")}
+            for c in children
+        ]
+
+    _fill_media_urls([c for children in children_by_parent.values() for c in children], user_token)
+    return children_by_parent
+
+
+def _fill_media_urls(nodes, user_token: str):
+    """
+    Fill in media_url (or thumbnail) and media_type, in place, for nodes that came back
+    without a media_url, using one batched `?ids=` read for all of them.
+    """
+    missing = [node for node in nodes if not node.get("media_url") and node.get("id")]
+    if not missing:
         return
+    resolved = get_client().get_many(
+        [node["id"] for node in missing],
+        "media_type,media_url,thumbnail_url",
+        access_token=user_token,
+    )
+    for node in missing:
+        info = resolved.get(str(node["id"])) or {}
+        node["media_url"] = info.get("media_url") or info.get("thumbnail_url")
+        node["media_type"] = (info.get("media_type") or node.get("media_type") or "").upper()
 
-    os.makedirs(folder, exist_ok=True)
-    for idx, media in enumerate(media_list, start=1):
-        media_id = media.get("id")
-        media_type = (media.get("media_type") or "").upper()
 
+class DownloadEngine:
+    """
+    Bounded-concurrency media downloader shared by every download entry point.
+    Runs jobs on a worker pool of `max_workers` threads and additionally caps the
+    number of simultaneous transfers per host (CDN edge) at `per_host`.
+    Files go through a MediaStore, so media already complete on disk is skipped and
+    interrupted downloads resume (also when a transient failure is retried by the
+    "download" RetryPolicy). Each job is a dict {"url", "filename", "key", "label"};
+    each result adds {"path", "bytes", "seconds", "ok", "skipped", "resumed", "error"}.
+    """
+
+    def __init__(self, folder: str, max_workers: int | None = None, per_host: int | None = None, client=None):
+        self.folder = folder
+        self.max_workers = max_workers or config.DOWNLOAD_WORKERS
+        self.per_host = per_host or config.DOWNLOAD_PER_HOST
+        self.client = client or get_client()
+        self.store = MediaStore(folder)
+        self._host_slots = {}
+        self._host_lock = threading.Lock()
+
+    def _slot(self, url: str):
+        host = urlparse(url).netloc
+        with self._host_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def download(self, job: dict) -> dict:
+        url = job["url"]
+        path = self.store.path(job["filename"])
+        result = {**job, "path": path, "bytes": 0, "seconds": 0.0, "ok": False, "skipped": False, "resumed": False, "error": None}
+        key = job.get("key") or job["filename"]
+        if self.store.is_complete(key, job["filename"]):
+            result.update(ok=True, skipped=True)
+            return result
+        with self._slot(url):
+            start = time.perf_counter()
+            try:
+                # Retries resume from the .part file the failed attempt left behind
+                fetched = get_policy("download").call(
+                    self.store.fetch, self.client, url, key, job["filename"], label=f"Download {job['filename']}"
+                )
+                result.update(ok=True, bytes=fetched["bytes"], skipped=fetched["skipped"], resumed=fetched["resumed"])
+            except Exception as e:
+                result["error"] = str(e)
+            result["seconds"] = time.perf_counter() - start
+        return result
+
+    def run(self, jobs: list) -> list:
+        """Download all jobs concurrently; prints one line per file and a summary."""
+        if not jobs:
+            return []
+        os.makedirs(self.folder, exist_ok=True)
+        results = []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.download, job) for job in jobs]
+            for fut in as_completed(futures):
+                res = fut.result()
+                results.append(res)
+                if res["skipped"]:
+                    print(f"{res['label']} Already have {res['filename']}")
+                elif res["ok"]:
+                    resumed = " (resumed)" if res["resumed"] else ""
+                    print(f"{res['label']} Saved {res['filename']} ({_fmt_bytes(res['bytes'])} in {res['seconds']:.2f}s, {_fmt_rate(res['bytes'], res['seconds'])}){resumed}")
+                else:
+                    print(f"{res['label']} Failed to download {res['url']}: {res['error']}")
+
+        elapsed = time.perf_counter() - start
+        total = sum(r["bytes"] for r in results)
+        ok = sum(1 for r in results if r["ok"])
+        skipped = sum(1 for r in results if r["skipped"])
+        print(f"⬇️ Downloaded {ok - skipped}/{len(jobs)} files ({skipped} already complete), {_fmt_bytes(total)} in {elapsed:.2f}s ({_fmt_rate(total, elapsed)})")
+        return results
+
+
+def _fmt_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def _fmt_rate(n: int, seconds: float) -> str:
+    return f"{_fmt_bytes(n / seconds if seconds > 0 else 0)}/s"
+
+
+def _build_download_jobs(media_list, user_token: str) -> list:
+    """
+    Turn a list of media dicts (owned or Business Discovery) into download jobs,
+    expanding carousels into one job per child. Carousel children and missing media
+    URLs for the whole list are resolved with batched reads up front.
+    """
+    posts = []
+    for media in media_list:
+        media_id = media.get("id", media.get("media_id"))
+        media_type = (media.get("media_type") or "").upper()
+        children = None
         if media_type == "CAROUSEL_ALBUM":
-            children = media.get("children", {}).get("data", []) or _fetch_children(media_id, user_token)
+            children = [
+                {"id": c.get("id"), "media_type": (c.get("media_type") or "").upper(), "media_url": c.get("media_url")}
+                for c in media.get("children", {}).get("data", []) or []
+            ]
+        posts.append({"id": media_id, "media_type": media_type, "media_url": media.get("media_url"), "children": children})
+
+    needs_children = [p["id"] for p in posts if p["children"] == [] and p["id"]]
+    if needs_children:
+        fetched = _fetch_children_many(needs_children, user_token)
+        for post in posts:
+            if post["children"] == []:
+                post["children"] = fetched.get(str(post["id"]), [])
+
+    _fill_media_urls(
+        [c for p in posts if p["children"] for c in p["children"]] + [p for p in posts if p["children"] is None],
+        user_token,
+    )
+
+    jobs = []
+    total = len(posts)
+    for idx, post in enumerate(posts, start=1):
+        media_id = post["id"]
+        children = post["children"]
+
+        if children is not None:
             if not children:
-                print(f"[{idx}/{len(media_list)}] No children found for carousel {media_id}, skipping.")
+                print(f"[{idx}/{total}] No children found for carousel {media_id}, skipping.")
                 continue
 
             for c_idx, child in enumerate(children, start=1):
                 child_id = child.get("id")
-                media_url = child.get("media_url")
-                child_type = (child.get("media_type") or "").upper()
-                if not media_url:
-                    try:
-                        mresp = requests.get(
-                            f"https://graph.facebook.com/v19.0/{child_id}",
-                            params={"fields": "media_type,media_url,thumbnail_url", "access_token": user_token},
-                            timeout=30
-                        ).json()
-                        media_url = mresp.get("media_url") or mresp.get("thumbnail_url")
-                        child_type = (mresp.get("media_type") or child_type).upper()
-                    except Exception:
-                        media_url = None
-
-                if not media_url:
-                    print(f"[{idx}/{len(media_list)}][{c_idx}/{len(children)}] Skipping child {child_id}: no media_url")
+                label = f"[{idx}/{total}][{c_idx}/{len(children)}]"
+                if not child.get("media_url"):
+                    print(f"{label} Skipping child {child_id}: no media_url")
                     continue
 
-                ext = "mp4" if child_type in ("VIDEO", "REEL") else "jpg"
-                filename = f"{media_id}_{child_id}.{ext}"
-                filepath = os.path.join(folder, filename)
-                try:
-                    with requests.get(media_url, stream=True, timeout=60) as r:
-                        r.raise_for_status()
-                        import shutil
-                        with open(filepath, "wb") as f:
-                            shutil.copyfileobj(r.raw, f)
-                    print(f"[{idx}/{len(media_list)}][{c_idx}/{len(children)}] Downloaded {filename}")
-                except Exception as e:
-                    print(f"[{idx}/{len(media_list)}][{c_idx}/{len(children)}] Failed to download {media_url}: {e}")
+                ext = "mp4" if child.get("media_type") in ("VIDEO", "REEL") else "jpg"
+                jobs.append({"url": child["media_url"], "filename": f"{media_id}_{child_id}.{ext}", "key": str(child_id), "label": label})
             continue
 
-        media_url = media.get("media_url")
-        if not media_url:
-            try:
-                mresp = requests.get(
-                    f"https://graph.facebook.com/v19.0/{media_id}",
-                    params={"fields": "media_url,thumbnail_url,media_type", "access_token": user_token},
-                    timeout=30
-                ).json()
-                media_url = mresp.get("media_url") or mresp.get("thumbnail_url")
-                media_type = (mresp.get("media_type") or media_type).upper()
-            except Exception:
-                media_url = None
-
-        if not media_url:
-            print(f"[{idx}/{len(media_list)}] Skipping {media_id}: no media_url")
+        if not post.get("media_url"):
+            print(f"[{idx}/{total}] Skipping {media_id}: no media_url")
             continue
 
-        ext = "mp4" if media_type in ("VIDEO", "REEL") else "jpg"
-        filename = f"{media_id}.{ext}"
-        filepath = os.path.join(folder, filename)
-        try:
-            with requests.get(media_url, stream=True, timeout=60) as r:
-                r.raise_for_status()
-                import shutil
-                with open(filepath, "wb") as f:
-                    shutil.copyfileobj(r.raw, f)
-            print(f"Downloaded {filename}")
-        except Exception as e:
-            print(f"Failed to download {media_url}: {e}")
+        ext = "mp4" if post.get("media_type") in ("VIDEO", "REEL") else "jpg"
+        jobs.append({"url": post["media_url"], "filename": f"{media_id}.{ext}", "key": str(media_id), "label": f"[{idx}/{total}]"})
+    return jobs
+
+
+def download_last_n_media(user_token: str, ig_id: str, n: int = 10, folder: str = "media"):
+    """
+    Download the last n media (including carousel children) for the given IG account (owned media).
+    """
+    if not user_token or not ig_id:
+        print("Missing token or ig_id.")
+        return
+
+    media_resp = get_client().get(
+        f"{ig_id}/media",
+        params={"fields": "id,media_type,media_url,children{ id,media_type,media_url }", "limit": n},
+        access_token=user_token,
+        timeout=60,
+    )
+    media_list = media_resp.get("data", [])
+    if not media_list:
+        print("No media found.")
+        return
+
+    return download_media_from_list(media_list, n, folder, user_token)
 
 
 def download_media_from_profile_business_discovery(user_token: str, ig_id: str, profile_url: str, n: int = 5, folder: str = "media"):
@@ -175,88 +250,20 @@ def download_media_from_profile_business_discovery(user_token: str, ig_id: str,
         print("Could not extract username from URL.")
         return
 
-    target_ig_id, media_list = get_ig_id_from_username_business_discovery(username, ig_id, user_token, n=n)
+    target_ig_id, media_list = get_ig_id_from_username_business_discovery(username, ig_id, user_token, n=n, fields=BD_DOWNLOAD_FIELDS)
     if not media_list:
         print("No media available for that profile.")
         return
 
     os.makedirs(folder, exist_ok=True)
     print(media_list)
-    download_media_from_list(media_list, n, folder)
-
-def download_media_from_list(media_list, n, folder, user_token):
-        if not os.path.exists(folder):
-            os.makedirs(folder, exist_ok=True)
-        for idx, media in enumerate(media_list[:n], start=1):
-            media_id = media.get("id", media.get("media_id"))
-            media_type = (media.get("media_type") or "").upper()
-
-            if media_type == "CAROUSEL_ALBUM":
-                children = media.get("children", {}).get("data", []) or _fetch_children(media_id, user_token)
-                if not children:
-                    print(f"[{idx}/{min(n,len(media_list))}] No children found for carousel {media_id}, skipping.")
-                    continue
+    download_media_from_list(media_list, n, folder, user_token)
 
-                for c_idx, child in enumerate(children, start=1):
-                    child_id = child.get("id")
-                    media_url = child.get("media_url")
-                    child_type = (child.get("media_type") or "").upper()
-                    if not media_url:
-                        try:
-                            mresp = requests.get(
-                                f"https://graph.facebook.com/v19.0/{child_id}",
-                                params={"fields": "media_type,media_url,thumbnail_url", "access_token": user_token},
-                                timeout=30
-                            ).json()
-                            media_url = mresp.get("media_url") or mresp.get("thumbnail_url")
-                            child_type = (mresp.get("media_type") or child_type).upper()
-                        except Exception:
-                            media_url = None
-
-                    if not media_url:
-                        print(f"[{idx}/{min(n,len(media_list))}][{c_idx}/{len(children)}] Skipping child {child_id}: no media_url")
-                        continue
-
-                    ext = "mp4" if child_type in ("VIDEO", "REEL") else "jpg"
-                    filename = f"{media_id}_{child_id}.{ext}"
-                    filepath = os.path.join(folder, filename)
-                    try:
-                        with requests.get(media_url, stream=True, timeout=60) as r:
-                            r.raise_for_status()
-                            import shutil
-                            with open(filepath, "wb") as f:
-                                shutil.copyfileobj(r.raw, f)
-                        print(f"[{idx}/{min(n,len(media_list))}][{c_idx}/{len(children)}] Saved {filename}")
-                    except Exception as e:
-                        print(f"[{idx}/{min(n,len(media_list))}][{c_idx}/{len(children)}] Failed to download {media_url}: {e}")
-                continue
-
-            media_url = media.get("media_url")
-            if not media_url:
-                try:
-                    mresp = requests.get(
-                        f"https://graph.facebook.com/v19.0/{media_id}",
-                        params={"fields": "media_url,thumbnail_url,media_type", "access_token": user_token},
-                        timeout=30
-                    ).json()
-                    media_url = mresp.get("media_url") or mresp.get("thumbnail_url")
-                    media_type = (mresp.get("media_type") or media_type).upper()
-                except Exception:
-                    media_url = None
-
-            if not media_url:
-                print(f"[{idx}/{min(n,len(media_list))}] Skipping {media_id}: no media_url")
-                continue
 
-            ext = "mp4" if media_type in ("VIDEO", "REEL") else "jpg"
-            filename = f"{media_id}.{ext}"
-            filepath = os.path.join(folder, filename)
-            try:
-                with requests.get(media_url, stream=True, timeout=60) as r:
-                    r.raise_for_status()
-                    import shutil
-                    with open(filepath, "wb") as f:
-                        shutil.copyfileobj(r.raw, f)
-                print(f"[{idx}/{min(n,len(media_list))}] Saved {filename}")
-            except Exception as e:
-                print(f"[{idx}/{min(n,len(media_list))}] Failed to download {media_url}: {e}")
\ No newline at end of file
+def download_media_from_list(media_list, n, folder, user_token):
+    """
+    Download the first n media of `media_list` (carousel children included) into `folder`.
+    Returns the per-file results from DownloadEngine.run.
+    """
+    jobs = _build_download_jobs(media_list[:n], user_token)
+    return DownloadEngine(folder).run(jobs)
@@ -0,0 +1,105 @@
+import csv
+import json
+import math
+import os
+
+EXPORT_FORMATS = ("csv", "json", "jsonl")
+EXTENSIONS = {"csv": ".csv", "json": ".json", "jsonl": ".jsonl"}
+
+
+def _json_value(value):
+    """NaN/inf are not valid JSON; export them as null like pandas did."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+class _Exporter:
+    """Base for streaming exporters: rows are written as they arrive and flushed every `flush_every` rows."""
+
+    def __init__(self, path, flush_every: int = 100):
+        self.path = str(path)
+        self.flush_every = max(1, flush_every)
+        self.count = 0
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        self._f = self._open()
+
+    def _open(self):
+        return open(self.path, "w", encoding="utf-8", newline="")
+
+    def write(self, row: dict):
+        self._write(row)
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self._f.flush()
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+        return self.count
+
+    def close(self):
+        if not self._f.closed:
+            self._close()
+            self._f.close()
+
+    def _close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvExporter(_Exporter):
+    """CSV with a header taken from the first row (utf-8-sig so Excel opens it correctly); NaN/None are left empty."""
+
+    def _open(self):
+        self._writer = None
+        return open(self.path, "w", encoding="utf-8-sig", newline="")
+
+    def _write(self, row):
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._f, fieldnames=list(row.keys()), extrasaction="ignore")
+            self._writer.writeheader()
+        self._writer.writerow({k: ("" if _json_value(v) is None else v) for k, v in row.items()})
+
+
+class JsonLinesExporter(_Exporter):
+    """One JSON object per line."""
+
+    def _write(self, row):
+        self._f.write(json.dumps({k: _json_value(v) for k, v in row.items()}, ensure_ascii=False) + "\n")
+
+
+class JsonArrayExporter(_Exporter):
+    """A JSON array written incrementally: `[` up front, one element per row, `]` on close."""
+
+    def _open(self):
+        f = super()._open()
+        f.write("[")
+        return f
+
+    def _write(self, row):
+        body = json.dumps({k: _json_value(v) for k, v in row.items()}, ensure_ascii=False, indent=2)
+        self._f.write(("\n" if self.count == 0 else ",\n") + body)
+
+    def _close(self):
+        self._f.write("\n]\n" if self.count else "]\n")
+
+
+def open_exporter(path, export_format: str = "csv", flush_every: int = 100) -> _Exporter:
+    """Open a streaming exporter for `export_format` (csv, json or jsonl)."""
+    exporters = {"csv": CsvExporter, "json": JsonArrayExporter, "jsonl": JsonLinesExporter}
+    if export_format not in exporters:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    return exporters[export_format](path, flush_every=flush_every)
+
+
+def export_rows(rows, path, export_format: str = "csv", flush_every: int = 100) -> int:
+    """Stream `rows` (any iterable of dicts) into `path`; returns the number of rows written."""
+    with open_exporter(path, export_format, flush_every=flush_every) as exporter:
+        return exporter.write_many(rows)
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.genai import types
+
+import config
+from retry import get_policy
+
+# Keys every analysis entry has besides media_id and item_id
+ANALYSIS_FIELDS = (
+    "main_topic", "hook_transcript", "hook_visual_elements",
+    "format", "format_main_elements", "full_transcript",
+)
+
+RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {"item_id": {"type": "STRING"}, **{field: {"type": "STRING"} for field in ANALYSIS_FIELDS}},
+        "required": ["item_id", *ANALYSIS_FIELDS],
+        "property_ordering": ["item_id", *ANALYSIS_FIELDS],
+    },
+}
+
+PROMPT = (
+    "Act as a social media content analyst. Each media file above is preceded by a line 'item_id: <id>'. "
+    "Analyze EVERY media file and return a JSON array with exactly one object per item_id, copying the "
+    "item_id exactly as given. Object keys: item_id, " + ", ".join(ANALYSIS_FIELDS) + ". "
+    "For PDFs treat pages as carousel frames merged into one entry. Output only JSON."
+)
+
+# Changes whenever the prompt or schema does, so cached analyses from an older prompt are not reused
+PROMPT_VERSION = hashlib.sha256(json.dumps([PROMPT, RESPONSE_SCHEMA], sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def item_key(media_id, group_name) -> str:
+    """
+    Id of one analysed file. A post can yield several (a carousel's slides merged into a
+    PDF plus each of its videos), so media_id alone does not identify an entry.
+    """
+    return f"{media_id}:{group_name}"
+
+
+class JsonArrayParser:
+    """
+    Incremental parser for a streamed top-level JSON array: `feed()` text chunks as they
+    arrive and get back every element whose closing bracket has been seen. An element that
+    is not valid JSON becomes {"item_id", "error"} (item_id recovered if possible) instead
+    of failing the whole response.
+    """
+
+    def __init__(self):
+        self._buf = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.errors = 0
+
+    def _decode(self, raw: str):
+        try:
+            return json.loads(raw)
+        except ValueError:
+            self.errors += 1
+            match = re.search(r'"item_id"\s*:\s*"([^"\\]*)"', raw)
+            return {"item_id": match.group(1) if match else "", "error": "Invalid JSON entry"}
+
+    def feed(self, text: str) -> list:
+        done = []
+        for ch in text:
+            if self._depth == 0:
+                if ch == "[":
+                    self._depth = 1
+                continue
+            if self._depth == 1 and not self._buf:
+                if ch in " \t\r\n,":
+                    continue
+                if ch == "]":
+                    self._depth = 0
+                    continue
+            if self._in_string:
+                self._buf.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if self._depth == 1 and ch in ",]":
+                # End of a scalar element (the schema asks for objects, so it is dropped)
+                self._buf = []
+                self._depth = 0 if ch == "]" else 1
+                continue
+            self._buf.append(ch)
+            if ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+                if self._depth == 1:
+                    done.append(self._decode("".join(self._buf)))
+                    self._buf = []
+        return done
+
+
+def _file_bytes(item) -> int:
+    media_file, path = item[-1], item[2]
+    size = getattr(media_file, "size_bytes", None)
+    if size:
+        return int(size)
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def iter_shards(active_files, max_files: int | None = None, max_bytes: int | None = None):
+    """
+    Group (media_id, group, path, File) items into shards of at most `max_files` files /
+    `max_bytes` bytes, yielding each shard as soon as it is full (and the last one when
+    `active_files` is exhausted), so an iterator of files can be analysed as they arrive.
+    """
+    max_files = max_files or config.GEMINI_SHARD_FILES
+    max_bytes = max_bytes or config.GEMINI_SHARD_MB * 1024 * 1024
+    current, current_bytes = [], 0
+    for item in active_files:
+        size = _file_bytes(item)
+        if current and (current_bytes + size > max_bytes):
+            yield current
+            current, current_bytes = [], 0
+        current.append(item)
+        current_bytes += size
+        if len(current) >= max_files:
+            yield current
+            current, current_bytes = [], 0
+    if current:
+        yield current
+
+
+def _stream_entries(client, contents, label: str, on_element):
+    """
+    Stream a schema-constrained JSON response and call `on_element` with each array element
+    as soon as it is complete. Transient failures restart the stream under the "gemini"
+    RetryPolicy (callers ignore item_ids they already have).
+    """
+
+    def attempt():
+        parser = JsonArrayParser()
+        stream = client.models.generate_content_stream(
+            model=config.GEMINI_ANALYSIS_MODEL,
+            contents=contents,
+            config=types.GenerateContentConfig(response_mime_type="application/json", response_schema=RESPONSE_SCHEMA),
+        )
+        for chunk in stream:
+            for element in parser.feed(chunk.text or ""):
+                on_element(element)
+        if parser.errors:
+            print(f"⚠️ {label}: {parser.errors} entries were not valid JSON.")
+
+    print(f"🧠 {label}: streaming Gemini analysis...")
+    get_policy("gemini").call(attempt, label=f"Gemini {label}")
+
+
+def analyze_shard(client, shard, label: str = "shard", on_entry=None) -> list:
+    """
+    Analyse one shard. Each file is preceded by its item_id label (see item_key) and every
+    streamed entry is matched back by the item_id it carries, never by position, given its
+    file's media_id and passed to `on_entry` as soon as it arrives. Files the model
+    skipped, or that were still pending when the stream failed, come back as
+    {"media_id", "item_id", "error"} entries.
+    """
+    expected = {item_key(m, g): str(m) for m, g, _, _ in shard}
+    contents = []
+    for media_id, group_name, _, media_file in shard:
+        contents += [f"item_id: {item_key(media_id, group_name)}", media_file]
+    contents.append(PROMPT)
+
+    emit = on_entry or (lambda entry: None)
+    by_id = {}
+    missing_error = "missing from Gemini output"
+    started = time.perf_counter()
+
+    def handle(entry):
+        key = str(entry.get("item_id", "")).strip() if isinstance(entry, dict) else ""
+        if key in expected and key not in by_id:
+            entry.pop("item_id")
+            by_id[key] = entry = {"media_id": expected[key], "item_id": key, **entry}
+            emit(entry)
+        elif key not in by_id:
+            print(f"⚠️ {label}: ignoring entry with unexpected item_id {key!r}")
+
+    try:
+        _stream_entries(client, contents, label, handle)
+    except Exception as e:
+        print(f"❌ {label} failed after {len(by_id)}/{len(shard)} entries: {e}")
+        missing_error = str(e)
+    print(f"🧩 {label}: {len(shard)} files analysed in {time.perf_counter() - started:.1f}s")
+
+    for key, media_id in expected.items():
+        if key not in by_id:
+            by_id[key] = {"media_id": media_id, "item_id": key, "error": missing_error}
+            emit(by_id[key])
+    return [by_id[key] for key in expected]
+
+
+def analyze_media(client, active_files, username=None, max_workers: int | None = None, on_entry=None) -> list:
+    """
+    Analyse ACTIVE files in concurrent shards (see iter_shards) and merge the entries in
+    the order of `active_files`. `active_files` may be an iterator (e.g. iter_active): each
+    shard starts as soon as it is full, while later files are still being activated.
+    `on_entry(entry)` is called (one call at a time) for every entry as soon as it is
+    parsed, so callers can write results progressively.
+    """
+    workers = max(1, max_workers or config.GEMINI_ANALYSIS_WORKERS)
+    print(f"\n🚀 Invoking Gemini on ACTIVE files in shards ({workers} at a time)...")
+    lock = threading.Lock()
+
+    def emit(entry):
+        entry["username"] = username  # Add username to every entry
+        if on_entry is not None:
+            with lock:
+                on_entry(entry)
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for index, shard in enumerate(iter_shards(active_files), start=1):
+            futures.append(executor.submit(analyze_shard, client, shard, f"shard {index}", emit))
+    return [entry for future in futures for entry in future.result()]
@@ -0,0 +1,219 @@
+import os
+import random
+import threading
+import time
+
+import config
+from file_utils import atomic_write_json, read_json, sha256_file
+from retry import get_policy
+
+
+def _expiry_ts(media_file) -> float:
+    """Epoch seconds when a Gemini File expires (uploads live 48 h if the API does not say)."""
+    expires = getattr(media_file, "expiration_time", None)
+    if expires is not None:
+        try:
+            return expires.timestamp()
+        except AttributeError:
+            pass
+    return time.time() + 48 * 3600
+
+
+class UploadRegistry:
+    """
+    Local registry of files this tool uploaded to the Gemini Files API, keyed by content hash.
+    `upload()` reuses a previous upload of identical bytes while it is still ACTIVE (or
+    PROCESSING) and not about to expire, and uploads again otherwise. Content hashes are
+    remembered per path + mtime + size so unchanged files are not re-hashed.
+    Stored as JSON in CACHE_DIR/gemini_uploads.json.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or os.path.join(config.CACHE_DIR, "gemini_uploads.json")
+        data = read_json(self.path, {}) or {}
+        self._uploads = data.get("uploads", {})
+        self._hashes = data.get("hashes", {})
+        self._lock = threading.Lock()
+        self.uploaded = 0
+        self.uploaded_bytes = 0
+        self.reused = 0
+        self.reused_bytes = 0
+
+    def _save(self):
+        atomic_write_json(self.path, {"uploads": self._uploads, "hashes": self._hashes})
+
+    def content_hash(self, path: str) -> str:
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        with self._lock:
+            cached = self._hashes.get(key)
+            if cached and cached["mtime_ns"] == st.st_mtime_ns and cached["size"] == st.st_size:
+                return cached["sha256"]
+        digest = sha256_file(path)
+        with self._lock:
+            self._hashes[key] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest}
+        return digest
+
+    def _reusable(self, client, entry):
+        """The remote File for `entry` if it is still usable, else None."""
+        if entry["expires_at"] - time.time() < config.GEMINI_UPLOAD_REUSE_MARGIN:
+            return None
+        try:
+            media_file = get_policy("gemini").call(client.files.get, name=entry["name"], label="Gemini files.get")
+        except Exception:
+            return None
+        state = getattr(getattr(media_file, "state", None), "name", None)
+        return media_file if state in ("ACTIVE", "PROCESSING") else None
+
+    def upload(self, client, path: str):
+        """Upload `path` unless identical content is already uploaded and usable. Returns (File, reused)."""
+        digest = self.content_hash(path)
+        with self._lock:
+            entry = self._uploads.get(digest)
+        if entry:
+            media_file = self._reusable(client, entry)
+            if media_file is not None:
+                with self._lock:
+                    self.reused += 1
+                    self.reused_bytes += entry.get("size", 0)
+                return media_file, True
+
+        media_file = get_policy("gemini").call(client.files.upload, file=path, label=f"Gemini upload {os.path.basename(path)}")
+        size = os.path.getsize(path)
+        with self._lock:
+            self._uploads[digest] = {
+                "name": media_file.name,
+                "uri": getattr(media_file, "uri", None),
+                "mime_type": getattr(media_file, "mime_type", None),
+                "size": size,
+                "source": os.path.abspath(path),
+                "created_at": time.time(),
+                "expires_at": _expiry_ts(media_file),
+            }
+            self.uploaded += 1
+            self.uploaded_bytes += size
+            self._save()
+        return media_file, False
+
+    def cleanup(self, client=None, names=None) -> int:
+        """
+        Forget expired uploads and delete still-live ones from the Files API.
+        `names=None` deletes every live upload this tool created; otherwise only `names`.
+        Returns how many remote files were deleted.
+        """
+        deleted = 0
+        now = time.time()
+        with self._lock:
+            entries = list(self._uploads.items())
+        for digest, entry in entries:
+            expired = entry["expires_at"] <= now
+            if not expired and (names is None or entry["name"] in names):
+                if client is None:
+                    continue
+                try:
+                    get_policy("gemini").call(client.files.delete, name=entry["name"], label="Gemini files.delete")
+                    deleted += 1
+                except Exception as e:
+                    # Already gone remotely is fine; anything else keeps the entry for next time
+                    if "404" not in str(e) and "NOT_FOUND" not in str(e):
+                        print(f"⚠️ Could not delete upload {entry['name']}: {e}")
+                        continue
+            elif not expired:
+                continue
+            with self._lock:
+                self._uploads.pop(digest, None)
+        with self._lock:
+            self._hashes = {k: v for k, v in self._hashes.items() if os.path.exists(k)}
+            self._save()
+        return deleted
+
+    def finish_run(self, client, used_names):
+        """Apply GEMINI_UPLOAD_CLEANUP after an analysis run that used `used_names`, and print upload totals."""
+        if config.GEMINI_UPLOAD_CLEANUP == "after_run":
+            deleted = self.cleanup(client, names=set(used_names))
+            print(f"🧹 Deleted {deleted} Gemini uploads used in this run.")
+        else:
+            self.cleanup()  # "keep": only forget expired entries
+        print(self.report())
+
+    def report(self) -> str:
+        return (
+            f"☁️ Gemini uploads this session: {self.uploaded} uploaded ({self.uploaded_bytes / 1e6:.1f} MB), "
+            f"{self.reused} reused ({self.reused_bytes / 1e6:.1f} MB not re-sent)"
+        )
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_upload_registry() -> UploadRegistry:
+    """Return the process-wide UploadRegistry, creating it on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = UploadRegistry()
+    return _registry
+
+
+def _state(media_file) -> str | None:
+    return getattr(getattr(media_file, "state", None), "name", None)
+
+
+def iter_active(client, items, deadline: float | None = None, list_threshold: int | None = None):
+    """
+    Yield `items` (tuples whose last element is a Gemini File) as their files become ACTIVE.
+    One tracker polls every pending file together: with more than `list_threshold` pending it
+    pages through `files.list` once per round, otherwise it calls `files.get` per file. Rounds
+    back off exponentially with jitter (GEMINI_POLL_BASE .. GEMINI_POLL_MAX seconds) until
+    `deadline` seconds (GEMINI_ACTIVATION_DEADLINE) have passed. FAILED files and files still
+    pending at the deadline are reported and dropped. Failed status calls are simply
+    repeated in the next round, so they do not go through the retry policy.
+    """
+    deadline = time.monotonic() + (deadline or config.GEMINI_ACTIVATION_DEADLINE)
+    list_threshold = config.GEMINI_LIST_THRESHOLD if list_threshold is None else list_threshold
+    pending = {}
+    for item in items:
+        media_file = item[-1]
+        if _state(media_file) == "ACTIVE":
+            yield item
+        else:
+            pending[media_file.name] = item
+
+    requests_made = 0
+    delay = config.GEMINI_POLL_BASE
+    while pending:
+        if time.monotonic() >= deadline:
+            for name in pending:
+                print(f"❌ {name} did not become ACTIVE before the deadline.")
+            break
+        time.sleep(min(random.uniform(delay / 2, delay), max(0.0, deadline - time.monotonic())))
+        delay = min(config.GEMINI_POLL_MAX, delay * 2)
+
+        states = {}
+        if len(pending) > list_threshold:
+            try:
+                for media_file in client.files.list(config={"page_size": 100}):
+                    if media_file.name in pending:
+                        states[media_file.name] = media_file
+                        if len(states) == len(pending):
+                            break
+                requests_made += 1
+            except Exception as e:
+                print(f"⚠️ files.list failed ({e}); polling files one by one.")
+        for name in [n for n in pending if n not in states]:
+            try:
+                states[name] = client.files.get(name=name)
+            except Exception as e:
+                print(f"⚠️ Could not read status of {name}: {e}")
+            requests_made += 1
+
+        for name, media_file in states.items():
+            state = _state(media_file)
+            if state == "ACTIVE":
+                yield pending.pop(name)[:-1] + (media_file,)
+            elif state == "FAILED":
+                pending.pop(name)
+                print(f"❌ {name} failed to process.")
+    print(f"📡 Activation tracking used {requests_made} status requests.")
@@ -1,12 +1,8 @@
 import os
 import json
 from google import genai
-from google.genai.errors import ServerError
-import time
 from html_to_pdf import html_to_pdf
-from get_outliers import get_outliers
-import requests
-
+from retry import get_policy
 
 
 def generate_in_depth_report(access_token, ig_id, username):
@@ -36,27 +32,15 @@ def generate_in_depth_report(access_token, ig_id, username):
     )
 
     client = genai.Client()
-    retries = 5
-    raw_text = None
-    for attempt in range(retries):
-        try:
-            print(f"🧠 Attempt {attempt + 1}/{retries} for Gemini...")
-            response = client.models.generate_content(
-                model="gemini-2.5-flash-lite",
-                contents=[full_prompt],
-            )
-            print("🧩 Gemini raw response:", response)
-            raw_text = response.text.strip()
-            break
-        except ServerError as e:
-            if "503" in str(e):
-                wait = 2 ** attempt
-                print(f"⚠️ Gemini overloaded (503). Retrying in {wait}s...")
-                time.sleep(wait)
-            else:
-                raise e
-    else:
-        raise RuntimeError("❌ Gemini API failed after multiple attempts.")
+    print("🧠 Asking Gemini for the in-depth report...")
+    response = get_policy("gemini").call(
+        client.models.generate_content,
+        model="gemini-2.5-flash-lite",
+        contents=[full_prompt],
+        label="Gemini report",
+    )
+    print("🧩 Gemini raw response:", response)
+    raw_text = (response.text or "").strip()
 
     result_text = raw_text if raw_text else ""
 
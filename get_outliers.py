@@ -1,315 +1,380 @@
-from business_discovery import get_ig_id_from_username_business_discovery
-from downloads import download_media_from_list
-from insights import get_post_insights
-import requests
+from business_discovery import iter_business_discovery_pages
+from downloads import DownloadEngine, _build_download_jobs
+from insights import export_post_insights
+from graph_client import get_client
+from pipeline import Stage, run_pipeline
+from metrics import column, nan_mean
+from outliers import RollingBaseline, post_timestamps, score_posts, select_outliers
+from media_probe import get_probe
+from pdf_merge import merge_in_pool
+from media_optimize import OptimizeStats, optimize_for_upload
+from gemini_uploads import get_upload_registry, iter_active
+from gemini_analysis import analyze_media, item_key
+from analysis_cache import get_analysis_cache
+from exporters import JsonArrayExporter
+import config
 import os
 import re
-from PIL import Image
+import numpy as np
 from collections import defaultdict
 from google import genai
-from google.genai.errors import ServerError
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import time
-import json
-from insights import get_post_insights
-import subprocess
-
-def get_outliers(user_token, ig_id, username, n_media, multiplier):
+from itertools import chain, islice
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png"}
+AUDIO_VIDEO_EXTS = {".mp4", ".mov"}
+MAX_VIDEO_SECONDS = config.MAX_UPLOAD_VIDEO_SECONDS
+
+
+def get_outliers(user_token, ig_id, username, n_media, multiplier, max_workers=5, method="mean", by_type=False, window_days=None):
+    """
+    Find outlier posts and analyse them with Gemini.
+    `method` picks the outlier test (see outliers.score_posts) and `multiplier` is its
+    threshold: likes / mean for "mean" (the default), robust z-score for "mad",
+    percentile rank for "percentile". `by_type` uses a baseline per media type and
+    `window_days` a rolling time-window baseline.
+    Returns {"fetched", "outliers", "analysed", "errors", "output"}; "output" is None (and
+    earlier results are left untouched) when no posts were fetched or nothing was analysed.
+    Runs as a streaming pipeline: Business Discovery pages feed an outlier selector,
+    whose picks are downloaded, merged/probed and uploaded stage by stage while later
+    pages are still loading.
+    """
     folder = f"outlier_media/{username}"
     
-    # Check if media already exists in the folder FIRST
-    media_exts = {".jpg", ".jpeg", ".png", ".mp4", ".mov", ".pdf", ".webp"}
-    has_existing_media = False
-    if os.path.isdir(folder):
-        for fname in os.listdir(folder):
-            if fname.startswith("."):
-                continue
-            ext = os.path.splitext(fname)[1].lower()
-            if ext in media_exts:
-                has_existing_media = True
-                break
-
-    skip_download = False
-    if has_existing_media:
-        try:
-            answer = input(f"Found existing media in '{folder}'. Do you want to download again? (y/N): ").strip().lower()
-        except Exception:
-            answer = "n"
-        if answer not in ("y", "yes"):
-            skip_download = True
-            print("Skipping download; using existing media.")
-
     # Check if the username matches the authenticated account
-    resp = requests.get(
-        f"https://graph.facebook.com/v19.0/{ig_id}",
-        params={"fields": "username", "access_token": user_token},
-        timeout=20,
-    )
-    own_username = resp.json().get("username")
-    search_type = "other"
+    resp = get_client().get(ig_id, params={"fields": "username"}, access_token=user_token, timeout=20)
+    own_username = resp.get("username")
     own_content = False
     if username == own_username:
         own_content = True
-        search_type = "own"
+        likes_key = "likes"
         print(f"Analyzing your own profile ({username}) with detailed insights...")
-        df = get_post_insights(user_token, ig_id, n=n_media, export_format="json", username=username)
-        media_list = df.to_dict('records')
-        average_likes = (sum(item.get("likes") or 0 for item in media_list)/ len(media_list) if media_list else 0)
-        outliers = [item for item in media_list if (item.get("likes") or 0) > multiplier * average_likes]
+        records = export_post_insights(user_token, ig_id, n=n_media, export_format="json", username=username)
+        pages = iter(lambda: list(islice(records, 50)), [])
     else:
+        likes_key = "like_count"
         print(f"Analyzing profile {username} with business discovery...")
-        target_ig_id, media_list = get_ig_id_from_username_business_discovery(username, ig_id, user_token, n=n_media)
-        average_likes = (sum(item.get("like_count") or 0 for item in media_list)/ len(media_list) if media_list else 0)
-        outliers = [item for item in media_list if (item.get("like_count") or 0) > multiplier * average_likes]
-
-    print(f"Found {len(outliers)} outlier posts with more than double the average likes ({average_likes:.2f})")
-    
-    # Only download if user confirmed or no existing media
-    if not skip_download:
-        download_media_from_list(outliers, n=len(outliers), folder=folder, user_token=user_token)
-
-    analyze_all_media(
-        media_dir=folder,
-        output_path=f"{folder}/{username}_outlier_media_results.json",
-        media_list=media_list,
-        max_workers=5,
-        own_content=own_content,
-        username=username  # Pass username to analyze_all_media
-    )
-
-
-def merge_images_to_pdf(image_paths, output_path):
-    """Merge multiple images into a single multi-page PDF."""
-    imgs = [Image.open(p).convert("RGB") for p in image_paths]
-    imgs[0].save(output_path, save_all=True, append_images=imgs[1:])
-    return output_path
-
-
-def get_video_duration(video_path):
-    """Get video duration in seconds using ffprobe, fallback to moviepy if available."""
-    # Primary: ffprobe (robust csv output)
-    try:
-        result = subprocess.run(
-            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", video_path],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        if result.returncode == 0 and result.stdout:
-            try:
-                return float(result.stdout.strip())
-            except Exception:
-                pass
-    except Exception as e:
-        # fall through to fallback attempts
-        pass
-
-
-    # Could not determine duration
-    print(f"⚠️ Could not determine duration for {video_path} (ffprobe/moviepy unavailable or failed).")
-    return None
-
-def analyze_all_media(media_dir="outlier_media/", output_path="outlier_media_results.json", media_list=None, max_workers=5, own_content=False, username=None):
-    if media_list is None:
-        media_list = []
+        pages = (page for _, page in iter_business_discovery_pages(username, ig_id, user_token, n=n_media))
 
+    os.makedirs(folder, exist_ok=True)
     client = genai.Client()
-
+    engine = DownloadEngine(folder)
+    media_list = []
+    selection = {}
+    optimize_stats = OptimizeStats()
+    cached_results = []
+
+    def download_stage(media):
+        # The media store skips files already complete from earlier runs
+        paths = []
+        for job in _build_download_jobs([media], user_token):
+            res = engine.download(job)
+            if res["skipped"]:
+                print(f"♻️ Already have {res['filename']}")
+            elif res["ok"]:
+                print(f"⬇️ Saved {res['filename']} ({res['bytes']} bytes in {res['seconds']:.2f}s)")
+            else:
+                print(f"❌ Failed to download {res['url']}: {res['error']}")
+                continue
+            paths.append(res["path"])
+        if paths:
+            yield media, paths
+
+    def prepare_stage(item):
+        media, paths = item
+        media_id = str(media.get("id", media.get("media_id")))
+        order_map = _carousel_order_map([media]).get(media_id, {})
+        for group_name, files in _group_media_paths(paths).items():
+            path = _prepare_group(folder, group_name, files, media_id, order_map)
+            upload_path = _upload_candidate(path, stats=optimize_stats) if path else None
+            if upload_path:
+                yield media_id, group_name, upload_path
+
+    def upload_stage(prepared):
+        # Media analysed before from identical bytes (same model/prompt) skip upload and analysis
+        cached = _cached_analysis(*prepared)
+        if cached:
+            cached_results.append(cached)
+            return
+        media_id, group_name, path, media_file = _upload_file(client, *prepared)
+        if media_file:
+            print(f"✅ Uploaded {os.path.basename(path)}")
+            yield media_id, group_name, path, media_file
+        else:
+            print(f"⚠️ Skipped {os.path.basename(path)} due to upload error.")
+
+    uploaded_files = run_pipeline(
+        _stream_outliers(pages, likes_key, media_list, selection, method, multiplier, by_type, window_days),
+        [
+            Stage("download", download_stage, workers=engine.max_workers),
+            Stage("prepare", prepare_stage, workers=config.PROBE_WORKERS),
+            Stage("upload", upload_stage, workers=max_workers),
+        ],
+    )
+    get_probe().save()
+    if config.OPTIMIZE_UPLOADS:
+        print(optimize_stats.report())
+
+    outlier_ids = selection.get("ids", set())
+    print(f"Found {len(outlier_ids)} outlier posts ({method} score above {multiplier}; average likes {selection.get('average', 0):.2f})")
+
+    # Posts picked against an early running average can fall below the final threshold
+    kept = [u for u in uploaded_files if u[0] in outlier_ids]
+    if len(kept) < len(uploaded_files):
+        print(f"↩️ Dropping {len(uploaded_files) - len(kept)} early picks that are below the final threshold.")
+
+    active_files = _iter_active_files(client, kept)
+    cached_kept = [entry for entry in cached_results if entry["media_id"] in outlier_ids]
+    children_map = _carousel_children_map(media_list)
+
+    def finish(entry):
+        _attach_metadata([entry], media_list, children_map, own_content)
+        entry["outlier_score"] = selection.get("scores", {}).get(entry.get("media_id"))
+
+    output_path = f"{folder}/{username}_outlier_media_results.json"
+    summary = {"fetched": len(media_list), "outliers": len(outlier_ids), "analysed": 0, "errors": 0, "output": None}
+    if not media_list:
+        print(f"❌ No posts fetched for {username}; previous results (if any) are left untouched.")
+        return summary
+    results = _analyze_with_gemini(client, active_files, username, output_path, cached_kept, finish)
+    get_upload_registry().finish_run(client, [f.name for _, _, _, f in uploaded_files])
+    if results:
+        summary.update(analysed=len(results), errors=sum("error" in r for r in results), output=output_path)
+    return summary
+
+
+def _stream_outliers(pages, likes_key, media_list, selection, method="mean", threshold=None, by_type=False, window_days=None):
+    """
+    Yield outlier posts while pages are still arriving.
+    Each page is added to incremental RollingBaselines (one per media type if `by_type`)
+    and its posts that already score above `threshold` are yielded straight away. Once
+    the source is exhausted every post is re-scored against the final baseline
+    (outliers.score_posts) and posts that only qualify then are yielded too.
+    All fetched posts are appended to `media_list`; the final outlier ids, their
+    scores and the average likes are stored in `selection`.
+    """
+    baselines = defaultdict(lambda: RollingBaseline(window_days, method))
+    emitted = set()
+
+    def post_id(item):
+        return str(item.get("id", item.get("media_id")))
+
+    for page in pages:
+        media_list.extend(page)
+        likes = column(page, likes_key).tolist()
+        types = [item.get("media_type") if by_type else "" for item in page]
+        for value, ts, media_type in zip(likes, post_timestamps(page).tolist(), types):
+            baselines[media_type].add(value, ts)
+
+        scores = np.array([baselines[t].score(v) for v, t in zip(likes, types)])
+        for item, hit in zip(page, select_outliers(scores, method, threshold)):
+            if hit:
+                emitted.add(post_id(item))
+                yield item
+
+    scores = score_posts(media_list, likes_key, method, by_type, window_days)
+    hits = select_outliers(scores, method, threshold)
+    selection["average"] = nan_mean(column(media_list, likes_key))
+    selection["scores"] = {post_id(item): (None if np.isnan(score) else float(score)) for item, score in zip(media_list, scores)}
+    selection["ids"] = {post_id(item) for item, hit in zip(media_list, hits) if hit}
+    for item, hit in zip(media_list, hits):
+        if hit and post_id(item) not in emitted:
+            yield item
+
+
+def get_video_duration(video_path, info=None):
+    """Video duration in seconds from the cached ffprobe results (media_probe), or None."""
+    info = info or get_probe().probe(video_path)
+    if info.get("duration") is None:
+        print(f"⚠️ Could not determine duration for {video_path} ({info.get('error') or 'ffprobe returned no duration'}).")
+    return info.get("duration")
+
+def _group_media_paths(paths):
+    """Group media files: carousel slides (parentID_childID.jpg) together, everything else on its own."""
     def get_carousel_prefix(filename):
         # Match pattern: parentID_childID.ext -> return parentID
         match = re.match(r"^(\d{5,})_\d+\.[^.]+$", filename)
         return match.group(1) if match else None
 
-    image_exts = {".jpg", ".jpeg", ".png"}
-    audio_video_exts = {".mp4", ".mov"}
     carousel_groups = defaultdict(list)
-
-    # --- Group media ---
-    for filename in os.listdir(media_dir):
-        if filename.startswith("."):
-            continue
-        path = os.path.join(media_dir, filename)
-        if not os.path.isfile(path):
-            continue
-
+    for path in paths:
+        filename = os.path.basename(path)
         ext = os.path.splitext(filename)[1].lower()
-        if ext in image_exts:
+        if ext in IMAGE_EXTS:
             prefix = get_carousel_prefix(filename)
             if prefix:
                 carousel_groups[prefix].append(path)
             else:
                 carousel_groups[filename] = [path]
-        elif ext in audio_video_exts:
+        elif ext in AUDIO_VIDEO_EXTS:
             carousel_groups[filename] = [path]
+    return carousel_groups
 
-    print(f"📦 Found {len(carousel_groups)} media groups in total.")
 
-    # Build carousel_children map and order map BEFORE merge loop
-    carousel_children_map = {}
-    carousel_order_map = {}  # media_id -> {child_id: position_index}
-    
+def _carousel_children_map(media_list):
+    """media_id -> list of child media URLs (API order)."""
+    children_map = {}
     for item in media_list:
         item_id = str(item.get("id", item.get("media_id", "")))
         children = item.get("children", {}).get("data", [])
         if children:
-            carousel_children_map[item_id] = [child.get("media_url", "") for child in children]
-            carousel_order_map[item_id] = {str(child.get("id", "")): idx for idx, child in enumerate(children)}
-
-    # --- Merge carousels into PDFs (sort slides by API position) ---
-    prepared_files = []
-    
-    for group_name, files in carousel_groups.items():
-        media_id_match = re.findall(r"\d{5,}", group_name)
-        media_id = media_id_match[0] if media_id_match else group_name
-
-        if len(files) > 1 and all(os.path.splitext(f)[1].lower() in image_exts for f in files):
-            # Sort by API-provided position (from carousel_order_map)
-            def get_api_position(path):
-                basename = os.path.basename(path)
-                match = re.search(r"_(\d+)\.[^.]+$", basename)
-                child_id = match.group(1) if match else None
-                if media_id in carousel_order_map and child_id in carousel_order_map[media_id]:
-                    return carousel_order_map[media_id][child_id]
-                return 999  # fallback for unknown children
-            
-            files_sorted = sorted(files, key=get_api_position)
-            pdf_path = os.path.join(media_dir, f"{group_name}.pdf")
-            merge_images_to_pdf(files_sorted, pdf_path)
-            prepared_files.append((media_id, group_name, pdf_path))
-            print(f"📄 Merged carousel '{group_name}' into {os.path.basename(pdf_path)} (ID: {media_id}, {len(files_sorted)} slides in API order)")
-        else:
-            prepared_files.append((media_id, group_name, files[0]))
+            children_map[item_id] = [child.get("media_url", "") for child in children]
+    return children_map
 
-    print(f"📁 Ready to upload {len(prepared_files)} files (after merging carousels).")
 
-    # --- Upload all files in parallel ---
-    def upload_file(media_id, group_name, path):
-        try:
-            media_file = client.files.upload(file=path)
-            return media_id, group_name, path, media_file
-        except Exception as e:
-            print(f"❌ Upload failed for {path}: {e}")
-            return media_id, group_name, path, None
+def _carousel_order_map(media_list):
+    """media_id -> {child_id: position_index}."""
+    order_map = {}
+    for item in media_list:
+        item_id = str(item.get("id", item.get("media_id", "")))
+        children = item.get("children", {}).get("data", [])
+        if children:
+            order_map[item_id] = {str(child.get("id", "")): idx for idx, child in enumerate(children)}
+    return order_map
+
+
+def _submit_group(media_dir, group_name, files, order_map):
+    """
+    Start merging a multi-image carousel into a PDF (slides sorted by API position) in the
+    pdf_merge process pool. Returns a Future of (pdf_path, skipped), or None when the group
+    is a single file that is uploaded as is.
+    """
+    if len(files) > 1 and all(os.path.splitext(f)[1].lower() in IMAGE_EXTS for f in files):
+        def get_api_position(path):
+            basename = os.path.basename(path)
+            match = re.search(r"_(\d+)\.[^.]+$", basename)
+            child_id = match.group(1) if match else None
+            return order_map.get(child_id, 999)  # fallback for unknown children
+
+        files_sorted = sorted(files, key=get_api_position)
+        return merge_in_pool(files_sorted, os.path.join(media_dir, f"{group_name}.pdf"))
+    return None
 
-    print(f"🚀 Uploading in parallel (max {max_workers} workers)...")
-    uploaded_files = []
-    
-    # Filter out videos longer than 3 minutes before uploading
-    files_to_upload = []
-    for media_id, group_name, path in prepared_files:
-        ext = os.path.splitext(path)[1].lower()
-        if ext in {".mp4", ".mov"}:
-            duration = get_video_duration(path)
-            if duration is None or duration > 180:
-                # Skip if unknown or > 3 min
-                print(f"⏭️ Skipped {os.path.basename(path)} (duration check failed or > 3 min)")
-                continue
-        files_to_upload.append((media_id, group_name, path))
-    
-    print(f"📊 Total prepared: {len(prepared_files)}, Uploading: {len(files_to_upload)}")
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(upload_file, m, g, p): (m, g, p) for m, g, p in files_to_upload}
-        for fut in as_completed(futures):
-            media_id, group_name, path, media_file = fut.result()
-            if media_file:
-                uploaded_files.append((media_id, group_name, path, media_file))
-                print(f"✅ Uploaded {os.path.basename(path)}")
-            else:
-                msg = f"⚠️ Skipped {os.path.basename(path)} due to upload error."
-                print(msg)
-
-    # --- Wait for all to become ACTIVE ---
-    def wait_until_active(media_id, group_name, path, media_file, retries=20, delay=2):
-        for _ in range(retries):
-            file_info = client.files.get(name=media_file.name)
-            if file_info.state.name == "ACTIVE":
-                return media_id, group_name, path, media_file
-            elif file_info.state.name == "FAILED":
-                raise RuntimeError(f"{media_file.name} failed to process.")
-            time.sleep(delay)
-        raise TimeoutError(f"{media_file.name} did not become ACTIVE in time.")
-
-    print("\n⏳ Waiting for all uploads to become ACTIVE...")
-    active_files = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(wait_until_active, m, g, p, f): (m, g, p, f) for m, g, p, f in uploaded_files}
-        for fut in as_completed(futures):
-            try:
-                m, g, p, f = fut.result()
-                active_files.append((m, g, p, f))
-                print(f"✅ {os.path.basename(p)} is ACTIVE.")
-            except Exception as e:
-                print(f"❌ Activation failed: {e}")
-
-    print(f"\n🚀 {len(active_files)} ACTIVE files, invoking Gemini once...")
-
-    # --- Gemini prompt ---
-    prompt = (
-        "Act as a social media content analyst. Analyze ALL uploaded media and return ONLY a valid JSON array. "
-        "Each element object keys: media_id, main_topic, hook_transcript, hook_visual_elements, format, format_main_elements, full_transcript. "
-        "For PDFs treat pages as carousel frames merged into one entry. Output only JSON."
-    )
 
-    # --- Call Gemini with retry logic ---
-    retries = 5
-    raw_text = None
-    for attempt in range(retries):
-        try:
-            print(f"🧠 Attempt {attempt + 1}/{retries} for Gemini...")
-            response = client.models.generate_content(
-                model="gemini-2.5-pro",
-                contents=[f for _, _, _, f in active_files] + [prompt],
-            )
-            print("🧩 Gemini raw response:", response)
-            raw_text = response.text.strip()
-            break
-        except ServerError as e:
-            if "503" in str(e):
-                wait = 2 ** attempt
-                print(f"⚠️ Gemini overloaded (503). Retrying in {wait}s...")
-                time.sleep(wait)
-            else:
-                raise e
+def _finish_group(group_name, files, media_id, future):
+    """Wait for a _submit_group merge and return the path to upload (None if the merge failed)."""
+    if future is None:
+        return files[0]
+    try:
+        pdf_path, skipped = future.result()
+    except Exception as e:
+        print(f"❌ Could not merge carousel '{group_name}': {e}")
+        return None
+    if skipped:
+        print(f"♻️ Carousel '{group_name}' unchanged, reusing {os.path.basename(pdf_path)}")
     else:
-        raise RuntimeError("❌ Gemini API failed after multiple attempts.")
-
-    # --- JSON parsing helper ---
-    def safe_json_parse(text):
-        import re, json
-        text = text.strip()
-        try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            pass
-        match = re.search(r"(\[.*\])", text, re.DOTALL)
-        if match:
-            try:
-                return json.loads(match.group(1))
-            except Exception:
-                pass
-        match = re.search(r"(\{.*\})", text, re.DOTALL)
-        if match:
-            try:
-                return json.loads(match.group(1))
-            except Exception:
-                pass
-        text = re.sub(r"```(?:json)?", "", text)
-        text = text.replace("```", "")
-        try:
-            return json.loads(text.strip())
-        except Exception:
-            return None
-
-    parsed_json = safe_json_parse(raw_text)
-    results = parsed_json if isinstance(parsed_json, list) else [{"error": "Invalid JSON output"}]
-
-    # --- Assign media_ids (removed validation prints) ---
-    for i, entry in enumerate(results):
-        if i < len(active_files):
-            entry["media_id"] = str(active_files[i][0])
-        entry["username"] = username  # Add username to every entry
-
+        print(f"📄 Merged carousel '{group_name}' into {os.path.basename(pdf_path)} (ID: {media_id}, {len(files)} slides in API order)")
+    return pdf_path
+
+
+def _prepare_group(media_dir, group_name, files, media_id, order_map):
+    """Merge a multi-image carousel into a PDF (slides sorted by API position); otherwise return the single file."""
+    return _finish_group(group_name, files, media_id, _submit_group(media_dir, group_name, files, order_map))
+
+
+def _should_upload(path, info=None):
+    """Skip videos longer than MAX_VIDEO_SECONDS or whose duration cannot be read (`info`: a media_probe result)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in AUDIO_VIDEO_EXTS:
+        duration = get_video_duration(path, info)
+        if duration is None or duration > MAX_VIDEO_SECONDS:
+            print(f"⏭️ Skipped {os.path.basename(path)} (duration check failed or > {MAX_VIDEO_SECONDS:.0f}s)")
+            return False
+    return True
+
+
+def _upload_candidate(path, info=None, stats=None):
+    """
+    File to upload for `path`, or None to skip it. With OPTIMIZE_UPLOADS this is a
+    downscaled image or a (clipped) low-bitrate video proxy from media_optimize;
+    otherwise the original, filtered by _should_upload.
+    """
+    if not config.OPTIMIZE_UPLOADS:
+        return path if _should_upload(path, info) else None
+    result = optimize_for_upload(path, info)
+    if stats is not None:
+        stats.add(result)
+    if result is None:
+        print(f"⏭️ Skipped {os.path.basename(path)} (no duration/ffmpeg to clip it and it may exceed {MAX_VIDEO_SECONDS:.0f}s)")
+        return None
+    if result["clipped"]:
+        print(f"✂️ Clipped {os.path.basename(path)} to its first {MAX_VIDEO_SECONDS:.0f}s")
+    return result["path"]
+
+
+def _upload_file(client, media_id, group_name, path):
+    """Upload through the registry, which reuses a live upload of identical content."""
+    try:
+        media_file, reused = get_upload_registry().upload(client, path)
+        if reused:
+            print(f"♻️ Reusing Gemini upload {media_file.name} for {os.path.basename(path)}")
+        return media_id, group_name, path, media_file
+    except Exception as e:
+        print(f"❌ Upload failed for {path}: {e}")
+        return media_id, group_name, path, None
+
+
+def _iter_active_files(client, uploaded_files):
+    """Yield uploaded files as they become ACTIVE (one batched tracker); the others are dropped."""
+    print("\n⏳ Analysing uploads as they become ACTIVE...")
+    for m, g, p, f in iter_active(client, uploaded_files):
+        print(f"✅ {os.path.basename(p)} is ACTIVE.")
+        yield m, g, p, f
+
+
+def _cached_analysis(media_id, group_name, path):
+    """Cached Gemini analysis of `path` for this media_id/group (see analysis_cache), or None."""
+    cached = get_analysis_cache().get(item_key(media_id, group_name), path)
+    if cached:
+        print(f"🗂️ Reusing cached analysis of {os.path.basename(path)} (from {cached['analysed_at']})")
+    return cached
+
+
+def _analyze_with_gemini(client, active_files, username, output_path, cached_results=(), finish=None):
+    """
+    Analyse ACTIVE files with Gemini (sharded, concurrent, streamed; see gemini_analysis).
+    `active_files` may be an iterator such as _iter_active_files: shards start while later
+    uploads are still activating. Cached entries are written first, then every new entry is
+    stored in the analysis cache, completed by `finish(entry)` and appended to the JSON
+    array at `output_path` as soon as it is parsed. Returns all entries in the order they
+    were written; with nothing to analyse the file is not touched and [] is returned.
+    """
+    active_files = iter(active_files)
+    first = next(active_files, None)
+    if first is None and not cached_results:
+        print(f"ℹ️ Nothing to analyse; {output_path} is left untouched.")
+        return []
+    cache = get_analysis_cache()
+    paths = {}
+
+    def track(items):
+        for item in items:
+            paths[item_key(item[0], item[1])] = item[2]
+            yield item
+
+    results = []
+    with JsonArrayExporter(output_path, flush_every=1) as exporter:
+
+        def write(entry):
+            if entry.get("item_id") in paths:
+                cache.put(entry["item_id"], paths[entry["item_id"]], entry)
+            if finish is not None:
+                finish(entry)
+            exporter.write(entry)
+            results.append(entry)
+
+        for entry in cached_results:
+            entry["username"] = username
+            write(entry)
+        if first is not None:
+            analyze_media(client, track(chain([first], active_files)), username, on_entry=write)
+    cache.save()
+    print(cache.report())
+    print(f"\n✅ Analysis complete. {len(results)} entries saved to: {output_path}")
+    return results
+
+
+def _attach_metadata(results, media_list, carousel_children_map, own_content):
+    """Copy post metrics/metadata from `media_list` onto each Gemini result entry."""
     media_lookup = {str(item.get("id", item.get("media_id", ""))): item for item in media_list}
 
     if own_content:
@@ -380,8 +445,3 @@ def analyze_all_media(media_dir="outlier_media/", output_path="outlier_media_res
                 entry.setdefault("comments_count", 0)
                 entry.setdefault("caption", "")
 
-    # ...existing code (cleanup uploads)...
-
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
-    print(f"\n✅ Analysis complete. Results saved to: {output_path}")
\ No newline at end of file
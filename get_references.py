@@ -1,10 +1,8 @@
 import os
-import requests
 from dotenv import load_dotenv
+from graph_client import get_client
 load_dotenv()   
 
-import requests
-
 def get_references(user_token, ig_id, username):
     # username = username.replace("@", "").strip()
 
@@ -28,9 +26,8 @@ def get_references(user_token, ig_id, username):
     # target_ig_id = bd.get("id")
 
     target_ig_id = "17841405480261603" 
-    url = f"https://graph.instagram.com/v19.0/me/conversations?user_id={target_ig_id}"
-    params = {"platform":"instagram",
-        "access_token": os.getenv("IG_ACCESS_TOKEN"),
-              }
-    response = requests.get(url, params=params).json()
+    graph = get_client()
+    url = f"https://graph.instagram.com/{graph.version}/me/conversations?user_id={target_ig_id}"
+    params = {"platform":"instagram"}
+    response = graph.get(url, params=params, access_token=os.getenv("IG_ACCESS_TOKEN"))
     print(response)
\ No newline at end of file
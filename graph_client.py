@@ -0,0 +1,216 @@
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from rate_limit import THROTTLE_CODES, RateLimitGovernor
+from response_cache import ResponseCache, cache_key, endpoint_ttl
+from retry import CircuitOpenError, RetryPolicy, classify_graph_result, get_policy
+
+# Graph "invalid parameter": in an ?ids= read, one unknown or inaccessible id fails the whole call
+INVALID_ID_CODE = 100
+
+
+class GraphClient:
+    """
+    Shared Graph API client.
+    Keeps one keep-alive connection pool for graph.facebook.com (and the CDN hosts
+    media is streamed from), applies a single API version and default timeout,
+    and decodes every response into a dict. Failures are normalised to the Graph
+    shape {"error": {"message", "type", "code", ...}} so callers can keep checking
+    `"error" in data` regardless of whether the network, the JSON or the API failed.
+    Successful GETs go through an optional ResponseCache (TTL by endpoint type);
+    with `refresh` set, cached entries are ignored but fresh responses still stored.
+    Every network call is paced by an optional RateLimitGovernor; throttled calls
+    wait out the governor's pause and are retried (up to RATE_LIMIT_RETRIES times).
+    Transient failures (network errors, 5xx, Graph codes 1/2) are retried by a RetryPolicy
+    (the shared "graph" policy by default); an open circuit returns a CircuitOpenError error.
+    """
+
+    def __init__(self, version=None, base_url=None, pool_size=None, timeout=None, cache=None, refresh=False, governor=None, retry: RetryPolicy | None = None):
+        self.version = version or config.GRAPH_API_VERSION
+        self.base_url = (base_url or config.GRAPH_API_BASE).rstrip("/")
+        self.pool_size = pool_size or config.GRAPH_POOL_SIZE
+        self.timeout = timeout or config.GRAPH_TIMEOUT
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.cache = cache
+        self.refresh = refresh
+        self.governor = governor
+        self.retry = retry or get_policy("graph")
+
+    def url(self, path: str) -> str:
+        """Build a versioned Graph URL; absolute URLs (e.g. paging.next) pass through."""
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.base_url}/{self.version}/{path.lstrip('/')}"
+
+    def request(self, method: str, path: str, params=None, data=None, access_token=None, timeout=None, classify_result=None) -> dict:
+        """
+        One Graph call with pacing and retries. `classify_result` replaces
+        retry.classify_graph_result for callers that handle some errors themselves.
+        """
+        try:
+            return self.retry.call(
+                self._paced_request, method, path, params, data, access_token, timeout,
+                classify_result=classify_result or classify_graph_result, label=f"Graph {method}",
+            )[0]
+        except CircuitOpenError as e:
+            return {"error": {"message": str(e), "type": "CircuitOpenError", "code": None}}
+
+    def _paced_request(self, method, path, params=None, data=None, access_token=None, timeout=None):
+        """One call through the governor (waiting out throttling pauses); returns (payload, headers)."""
+        if not self.governor:
+            return self._request(method, path, params, data, access_token, timeout)
+
+        # paging.next URLs carry their token in the query string
+        token = access_token or parse_qs(urlsplit(path).query).get("access_token", [None])[0]
+        for attempt in range(config.RATE_LIMIT_RETRIES + 1):
+            self.governor.acquire(token)
+            payload, headers = self._request(method, path, params, data, access_token, timeout)
+            if headers is not None:
+                self.governor.observe(headers, token)
+            code = (payload.get("error") or {}).get("code") if isinstance(payload, dict) else None
+            if code not in THROTTLE_CODES:
+                self.governor.succeeded(token)
+                return payload, headers
+            pause = self.governor.throttled(code, headers, token)
+            if pause > config.RATE_LIMIT_MAX_WAIT or attempt == config.RATE_LIMIT_RETRIES:
+                return payload, headers
+
+    def _request(self, method, path, params=None, data=None, access_token=None, timeout=None):
+        """One HTTP call; returns (decoded payload, response headers or None on network errors)."""
+        params = dict(params or {})
+        if access_token:
+            params["access_token"] = access_token
+        try:
+            resp = self.session.request(
+                method,
+                self.url(path),
+                params=params,
+                data=data,
+                timeout=timeout or self.timeout,
+            )
+        except requests.RequestException as e:
+            return {"error": {"message": str(e), "type": e.__class__.__name__, "code": None}}, None
+
+        try:
+            payload = resp.json()
+        except ValueError:
+            return {"error": {
+                "message": f"Invalid JSON response (HTTP {resp.status_code})",
+                "type": "DecodeError",
+                "code": None,
+                "status": resp.status_code,
+            }}, resp.headers
+
+        if resp.status_code >= 400 and not (isinstance(payload, dict) and "error" in payload):
+            return {"error": {"message": f"HTTP {resp.status_code}", "type": "HTTPError", "code": None, "status": resp.status_code}}, resp.headers
+        if isinstance(payload, dict) and isinstance(payload.get("error"), dict):
+            payload["error"].setdefault("status", resp.status_code)
+        return payload, resp.headers
+
+    def get(self, path: str, params=None, access_token=None, timeout=None, classify_result=None) -> dict:
+        ttl = endpoint_ttl(path, params) if self.cache else 0
+        if not ttl:
+            return self.request("GET", path, params=params, access_token=access_token, timeout=timeout, classify_result=classify_result)
+
+        key = cache_key(self.url(path), params)
+        if not self.refresh:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        else:
+            self.cache.skip()
+        payload = self.request("GET", path, params=params, access_token=access_token, timeout=timeout, classify_result=classify_result)
+        if not (isinstance(payload, dict) and "error" in payload):
+            self.cache.set(key, payload, ttl)
+        return payload
+
+    def post(self, path: str, data=None, params=None, access_token=None, timeout=None) -> dict:
+        return self.request("POST", path, params=params, data=data, access_token=access_token, timeout=timeout)
+
+    def get_many(self, ids, fields: str, access_token=None, chunk_size: int = 50, timeout=None) -> dict:
+        """
+        Read many nodes with `?ids=a,b,c&fields=...` (chunked to `chunk_size` ids per call).
+        Returns {id: node}; ids that could not be read map to the Graph error payload instead.
+        Only a chunk rejected for an invalid id (code 100, one bad id fails the multi-id read)
+        is retried one id at a time. Any other error (throttling, network, open circuit) is
+        returned for every id not read yet, without spending more requests.
+        """
+        ids = [str(i) for i in dict.fromkeys(ids) if i]
+        nodes = {}
+        failure = None
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            if failure is not None:
+                nodes.update(dict.fromkeys(chunk, failure))
+                continue
+            resp = self.get("", params={"ids": ",".join(chunk), "fields": fields}, access_token=access_token, timeout=timeout)
+            if "error" not in resp:
+                nodes.update({k: v for k, v in resp.items() if isinstance(v, dict)})
+                continue
+            if resp["error"].get("code") != INVALID_ID_CODE or len(chunk) == 1:
+                failure = None if resp["error"].get("code") == INVALID_ID_CODE else resp
+                nodes.update(dict.fromkeys(chunk, resp))
+                continue
+            for node_id in chunk:
+                if failure is None:
+                    node = self.get(node_id, params={"fields": fields}, access_token=access_token, timeout=timeout)
+                    if "error" in node and node["error"].get("code") != INVALID_ID_CODE:
+                        failure = node
+                nodes[node_id] = node if failure is None else failure
+        return nodes
+
+    def iter_pages(self, path: str, params=None, access_token=None, timeout=None):
+        """
+        Yield the `data` list of each page of an edge, following `paging.next` cursors
+        until the edge is exhausted (or the caller stops iterating). Stops on API errors.
+        """
+        resp = self.get(path, params=params, access_token=access_token, timeout=timeout)
+        while True:
+            if "error" in resp:
+                print(f"⚠️ API Error {describe_error(resp)}")
+                return
+            yield resp.get("data", []) or []
+            next_url = (resp.get("paging") or {}).get("next")
+            if not next_url:
+                return
+            # paging.next already carries the query (including the token)
+            resp = self.get(next_url, timeout=timeout)
+
+    def stream(self, url: str, timeout=60, headers=None):
+        """Open a streamed GET (media/CDN downloads) on the pooled session. Use as a context manager."""
+        return self.session.get(url, stream=True, timeout=timeout, headers=headers)
+
+    def close(self):
+        self.session.close()
+        if self.cache:
+            self.cache.close()
+
+
+def describe_error(payload: dict) -> str:
+    """One-line description of a decoded Graph error."""
+    err = payload.get("error") or {}
+    return f"{err.get('code')} ({err.get('type')}): {err.get('message')}"
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> GraphClient:
+    """Return the process-wide GraphClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                cache = ResponseCache() if config.RESPONSE_CACHE_ENABLED else None
+                governor = RateLimitGovernor() if config.RATE_LIMIT_ENABLED else None
+                _client = GraphClient(cache=cache, refresh=config.RESPONSE_CACHE_REFRESH, governor=governor)
+    return _client
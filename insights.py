@@ -1,83 +1,90 @@
-import requests
 import json
-import pandas as pd
 import os
+from datetime import datetime, timedelta, timezone
+from itertools import islice
 from pathlib import Path
 
+import config
+from exporters import EXTENSIONS, export_rows, open_exporter
+from file_utils import atomic_write_json, read_json
+from graph_client import get_client
+from metrics import add_engagement_rates
+
 def _get_insights_dir():
     base = Path(__file__).resolve().parent
     insights_dir = base / "insights"
     insights_dir.mkdir(parents=True, exist_ok=True)
     return insights_dir
 
-def get_post_insights(user_token: str, ig_id: str, filename: str = "instagram_insights.csv", n: int = 100, export_format: str = "csv", username: str | None = None):
-    if not user_token:
-        print("Missing access token.")
-        return
-    if not ig_id:
-        print("Missing IG id.")
-        return
+VIDEO_METRICS = [
+    "views", "reach", "saved", "likes",
+    "comments", "shares",
+    "ig_reels_video_view_total_time", "ig_reels_avg_watch_time"
+]
+CAROUSEL_METRICS = [
+    "views", "reach", "replies", "saved",
+    "likes", "comments", "shares",
+    "follows", "profile_visits",
+]
+# union of metrics for batch request
+ALL_METRICS = sorted(set(VIDEO_METRICS + CAROUSEL_METRICS))
 
-    video_metrics = [
-        "views", "reach", "saved", "likes",
-        "comments", "shares",
-        "ig_reels_video_view_total_time", "ig_reels_avg_watch_time"
-    ]
-    carousel_metrics = [
-        "views", "reach", "replies", "saved",
-        "likes", "comments", "shares",
-        "follows", "profile_visits",
-    ]
-    # union of metrics for batch request
-    all_metrics = sorted(set(video_metrics + carousel_metrics))
-    metrics_param = ",".join(all_metrics)
-
-    # 1) Get latest n media (basic fields)
-    media_resp = requests.get(
-        f"https://graph.facebook.com/v19.0/{ig_id}/media",
-        params={
-            "fields": "id,caption,timestamp,media_type,media_url,permalink",
-            "limit": n,
-            "access_token": user_token,
-        },
-        timeout=60
-    ).json()
-
-    media_list = media_resp.get("data", [])
-    if not media_list:
-        print("No media found for this Instagram account.")
-        return
 
-    results = []
+def _parse_timestamp(ts):
+    """Graph timestamps look like 2025-04-07T16:47:59+0000."""
+    try:
+        return datetime.strptime(ts, "%Y-%m-%dT%H:%M:%S%z")
+    except (TypeError, ValueError):
+        return None
+
 
-    # Helper: chunk ids to avoid overly long URLs
-    def chunks(lst, size):
-        for i in range(0, len(lst), size):
-            yield lst[i:i + size]
+def _sync_state_path(ig_id: str):
+    return _get_insights_dir() / f".sync_{ig_id}.json"
 
-    media_ids = [m.get("id") for m in media_list if m.get("id")]
-    batch_size = 50
 
+def _iter_media(user_token: str, ig_id: str, n: int, fields: str, since=None):
+    """Yield up to `n` media dicts from /{ig_id}/media, following paging cursors page by page."""
+    params = {"fields": fields, "limit": min(n, config.MEDIA_PAGE_SIZE)}
+    if since is not None:
+        params["since"] = since
+    count = 0
+    for page in get_client().iter_pages(f"{ig_id}/media", params=params, access_token=user_token, timeout=60):
+        for media in page:
+            yield media
+            count += 1
+            if count >= n:
+                return
+
+
+def _iter_insight_records(user_token: str, media_ids):
+    """
+    Stream one record (media fields + insights + custom rates) per post.
+    `media_ids` may be any iterable (e.g. a paginating generator); ids are pulled and
+    requested in ?ids= batches of 50, so only one batch is held in memory at a time.
+    """
+    graph = get_client()
+    metrics_param = ",".join(ALL_METRICS)
+    media_ids = iter(media_ids)
+
+    batch_size = 50
     processed = 0
-    for batch in chunks(media_ids, batch_size):
+    while True:
+        batch = [m for m in islice(media_ids, batch_size) if m]
+        if not batch:
+            break
         ids_str = ",".join(batch)
         # Request media fields + insights for the whole batch
         params = {
             "ids": ids_str,
             "fields": f"caption,timestamp,media_type,media_url,permalink,insights.metric({metrics_param})",
-            "access_token": user_token,
         }
-        try:
-            batch_resp = requests.get("https://graph.facebook.com/v19.0/", params=params, timeout=90).json()
-        except Exception as e:
-            print(f"Batch request failed for ids {ids_str[:200]}...: {e}")
-            continue
-
+        batch_resp = graph.get("", params=params, access_token=user_token, timeout=90)
         if "error" in batch_resp:
-            print("API Error:", batch_resp["error"])
+            print(f"Batch request failed for ids {ids_str[:200]}...:", batch_resp["error"])
             continue
 
         # batch_resp is a mapping { media_id: { fields... }, ... }
+        batch_records = []
         for media_id in batch:
             media_data = batch_resp.get(media_id) or {}
             caption = media_data.get("caption", "")
@@ -87,7 +94,7 @@ def get_post_insights(user_token: str, ig_id: str, filename: str = "instagram_in
             permalink = media_data.get("permalink")
 
             # Normalize insight values (use all_metrics union)
-            insight_values = {m: None for m in all_metrics}
+            insight_values = {m: None for m in ALL_METRICS}
             insights_obj = media_data.get("insights", {}).get("data", [])
             for item in insights_obj:
                 name = item.get("name")
@@ -95,20 +102,6 @@ def get_post_insights(user_token: str, ig_id: str, filename: str = "instagram_in
                 if values:
                     insight_values[name] = values[-1].get("value")
 
-            # Calculate custom engagement metrics
-            likes = float(insight_values.get("likes", 0))
-            saves = float(insight_values.get("saved", 0))
-            shares = float(insight_values.get("shares", 0))
-            comments = float(insight_values.get("comments", 0))
-            reach = float(insight_values.get("reach", 0))
-
-            # Custom engagement rates
-            custom_rates = {
-                "self_rate": saves / likes if likes > 0 else 0.0,
-                "social_rate": comments / likes if likes > 0 else 0.0,
-                "relatability_rate": (likes + shares) / reach if reach > 0 else 0.0
-            }
-
             record = {
                 "media_id": media_id,
                 "caption": (caption or "").replace("\n", " ")[:200],
@@ -117,41 +110,111 @@ def get_post_insights(user_token: str, ig_id: str, filename: str = "instagram_in
                 "media_url": media_url,
                 "permalink": permalink,
                 **insight_values,
-                **custom_rates
             }
-            results.append(record)
+            batch_records.append(record)
+
+        # Custom engagement rates for the whole batch at once (missing metrics -> None)
+        add_engagement_rates(batch_records)
+        for record in batch_records:
             processed += 1
-            print(f"[{processed}/{len(media_ids)}] Processed {media_id} ({mtype})")
+            print(f"[{processed}] Processed {record['media_id']} ({record['media_type']})")
+            yield record
 
-    # 3) Export to CSV or JSON into insights/ folder
-    df = pd.DataFrame(results)
-    insights_dir = _get_insights_dir()
 
-    # build output filename: if username provided use "{username}_insights", else use provided filename
-    if username:
-        base_name = f"{username}_insights"
-        if export_format == "json":
-            out_filename = base_name + ".json"
-        else:
-            out_filename = base_name + ".csv"
+def iter_post_insights(user_token: str, ig_id: str, n: int = 100):
+    """Stream insight records for the last `n` posts; memory stays flat however large `n` is."""
+    media = _iter_media(user_token, ig_id, n, fields="id")
+    return _iter_insight_records(user_token, (m.get("id") for m in media))
+
+
+def _incremental_media_ids(user_token: str, ig_id: str, n: int, state: dict, moving_window_days: int):
+    """
+    Ids to (re)fetch for an incremental sync: media newer than the newest synced
+    timestamp, plus stored posts still inside the "still moving" window.
+    """
+    newest = _parse_timestamp(state.get("newest_timestamp"))
+    since = int(newest.timestamp()) if newest else None
+    known = state.get("records", {})
+    new_ids = [
+        m["id"] for m in _iter_media(user_token, ig_id, n, fields="id,timestamp", since=since)
+        if m.get("id") and m["id"] not in known
+    ]
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=moving_window_days)
+    moving_ids = [
+        media_id for media_id, record in known.items()
+        if (_parse_timestamp(record.get("timestamp")) or cutoff) > cutoff
+    ]
+    print(f"🔄 Incremental sync: {len(new_ids)} new posts, {len(moving_ids)} posts inside the {moving_window_days}-day window to refresh.")
+    return new_ids + moving_ids
+
+
+def _insights_out_path(filename: str, export_format: str, username: str | None):
+    """insights/{username}_insights.<ext>, or the provided filename with the format's extension."""
+    ext = EXTENSIONS.get(export_format, ".csv")
+    out_filename = f"{username}_insights{ext}" if username else Path(filename).with_suffix(ext).name
+    return _get_insights_dir() / out_filename
+
+
+def export_post_insights(user_token: str, ig_id: str, n: int = 100, export_format: str = "csv", username: str | None = None, filename: str = "instagram_insights.csv", incremental: bool = False, moving_window_days: int | None = None):
+    """
+    Generator: stream insight records for the last `n` posts, writing each one to the
+    export file in insights/ as it arrives (csv, json or jsonl), and yield it.
+    With `incremental`, only posts newer than the last sync plus those published within
+    `moving_window_days` (default INSIGHTS_MOVING_WINDOW_DAYS) are fetched; the rest come
+    from the per-account sync state stored in insights/.sync_{ig_id}.json.
+    """
+    if not user_token:
+        print("Missing access token.")
+        return
+    if not ig_id:
+        print("Missing IG id.")
+        return
+
+    state = read_json(_sync_state_path(ig_id), default={}) if incremental else {}
+    if incremental and state.get("records"):
+        window = moving_window_days if moving_window_days is not None else config.INSIGHTS_MOVING_WINDOW_DAYS
+        records = _iter_insight_records(user_token, _incremental_media_ids(user_token, ig_id, n, state, window))
     else:
-        # respect provided filename
-        if export_format == "json":
-            out_filename = filename if filename.endswith(".json") else Path(filename).with_suffix(".json").name
-        else:
-            out_filename = filename if filename.endswith(".csv") else Path(filename).with_suffix(".csv").name
+        # 1) + 2) Page through the latest n media and stream their insights in batches
+        records = iter_post_insights(user_token, ig_id, n)
 
-    out_path = insights_dir / out_filename
+    if incremental:
+        history = state.get("records", {})
+        history.update({r["media_id"]: r for r in records if r.get("timestamp")})
+        timestamps = [r["timestamp"] for r in history.values() if _parse_timestamp(r.get("timestamp"))]
+        newest = max(timestamps, key=_parse_timestamp) if timestamps else None
+        atomic_write_json(_sync_state_path(ig_id), {"newest_timestamp": newest, "records": history})
+        records = sorted(history.values(), key=lambda r: _parse_timestamp(r["timestamp"]), reverse=True)[:n]
 
-    if export_format == "json":
-        df.to_json(out_path, orient="records", force_ascii=False, indent=2)
-        print(f"\n✅ Exported {len(results)} posts to {out_path}")
+    # 3) Export into insights/ folder as records arrive
+    out_path = _insights_out_path(filename, export_format, username)
+    with open_exporter(out_path, export_format) as exporter:
+        for record in records:
+            exporter.write(record)
+            yield record
+
+    if exporter.count:
+        print(f"\n✅ Exported {exporter.count} posts to {out_path}")
     else:
-        df.to_csv(out_path, index=False, encoding="utf-8-sig")
-        print(f"\n✅ Exported {len(results)} posts to {out_path}")
-    return df
+        print("No media found for this Instagram account.")
+
 
-def get_account_insights(user_token: str, ig_id: str, metrics=None, period: str = "day", since=None, until=None, date_preset=None, filename=None, username: str | None = None):
+def get_post_insights(user_token: str, ig_id: str, filename: str = "instagram_insights.csv", n: int = 100, export_format: str = "csv", username: str | None = None, incremental: bool = False, moving_window_days: int | None = None, as_dataframe: bool = False):
+    """
+    Fetch insights for the last `n` posts and export them into insights/ (see export_post_insights).
+    Returns the number of exported posts, or a pandas DataFrame of them if `as_dataframe`.
+    """
+    records = export_post_insights(
+        user_token, ig_id, n=n, export_format=export_format, username=username, filename=filename,
+        incremental=incremental, moving_window_days=moving_window_days,
+    )
+    if as_dataframe:
+        import pandas as pd
+        return pd.DataFrame(list(records))
+    return sum(1 for _ in records)
+
+def get_account_insights(user_token: str, ig_id: str, metrics=None, period: str = "day", since=None, until=None, date_preset=None, filename=None, username: str | None = None, as_dataframe: bool = False):
     if metrics is None:
         metrics = [
             "impressions", "reach", "profile_views",
@@ -159,7 +222,7 @@ def get_account_insights(user_token: str, ig_id: str, metrics=None, period: str
             "phone_call_clicks", "text_message_clicks",
             "accounts_engaged", "total_interactions", "follower_count"
         ]
-    params = {"metric": ",".join(metrics), "period": period, "access_token": user_token}
+    params = {"metric": ",".join(metrics), "period": period}
     if date_preset:
         params["date_preset"] = date_preset
     else:
@@ -170,8 +233,7 @@ def get_account_insights(user_token: str, ig_id: str, metrics=None, period: str
         if since is not None: params["since"] = since
         if until is not None: params["until"] = until
 
-    resp = requests.get(f"https://graph.facebook.com/v19.0/{ig_id}/insights", params=params, timeout=60)
-    data = resp.json()
+    data = get_client().get(f"{ig_id}/insights", params=params, access_token=user_token, timeout=60)
     if "error" in data:
         print("Error from Graph API:", data["error"])
         return None
@@ -195,8 +257,6 @@ def get_account_insights(user_token: str, ig_id: str, metrics=None, period: str
                     val = json.dumps(val, ensure_ascii=False)
                 rows.append({"ig_id": ig_id, "metric": name, "period": period_out, "end_time": v.get("end_time"), "value": val})
 
-    df = pd.DataFrame(rows)
-
     # Save into insights/ folder (use username if provided, else ig_id or provided filename)
     insights_dir = _get_insights_dir()
     if filename:
@@ -207,6 +267,9 @@ def get_account_insights(user_token: str, ig_id: str, metrics=None, period: str
     out_path = insights_dir / (out_filename if out_filename.endswith(".csv") else Path(out_filename).with_suffix(".csv").name)
 
     # always save CSV
-    df.to_csv(out_path, index=False, encoding="utf-8-sig")
-    print(f"✅ Exported {len(df)} rows to {out_path}")
-    return df
+    count = export_rows(rows, out_path, "csv")
+    print(f"✅ Exported {count} rows to {out_path}")
+    if as_dataframe:
+        import pandas as pd
+        return pd.DataFrame(rows)
+    return count
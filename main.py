@@ -1,17 +1,14 @@
+import argparse
+import traceback
+import os
 import config
-import requests
+from graph_client import get_client
+import retry
 from oauth import oauth_flow
 from accounts import select_instagram_account, extract_username_from_url
-from insights import get_post_insights, get_account_insights
-from downloads import download_last_n_media, download_media_from_profile_business_discovery
-from business_discovery import get_insights_for_profile_business_discovery
-from get_references import get_references
-from get_outliers import get_outliers
-import traceback
-import os
-import json
-from google import genai
-from generate_report import generate_in_depth_report
+
+# Menu actions import their modules when chosen, so the menu shows without loading
+# numpy, google-genai, PIL or pandas first (see benchmarks/bench_startup.py).
 
 
 def ensure_account():
@@ -41,6 +38,20 @@ def ensure_account():
     return True
 
 
+def ask_outlier_method():
+    """Prompt for the outlier test and its threshold. Returns (method, threshold)."""
+    from outliers import METHODS as OUTLIER_METHODS, DEFAULT_THRESHOLDS
+
+    method = input("Outlier method (mean/mad/percentile) [mean]: ").strip().lower() or "mean"
+    if method not in OUTLIER_METHODS:
+        method = "mean"
+    if method == "mean":
+        return method, float(input("multiplier from average likes: "))
+    label = "robust z-score threshold" if method == "mad" else "percentile threshold"
+    answer = input(f"{label} [{DEFAULT_THRESHOLDS[method]}]: ").strip()
+    return method, float(answer) if answer else DEFAULT_THRESHOLDS[method]
+
+
 def main_menu():
     global config
     while True:
@@ -68,7 +79,8 @@ def main_menu():
             if not config.ACCESS_TOKEN:
                 print("No USER token. Run option 1 first.")
             else:
-                selected = select_instagram_account(config.ACCESS_TOKEN)
+                # Choosing explicitly always lists the token's current accounts
+                selected = select_instagram_account(config.ACCESS_TOKEN, refresh=True)
                 if selected:
                     config.IG_ID = selected
                     print(f"Selected IG ID set to {config.IG_ID}")
@@ -79,22 +91,19 @@ def main_menu():
                 pass
             else:
                 try:
+                    from exporters import EXPORT_FORMATS
+                    from insights import get_post_insights
+
                     n = int(input("How many recent posts do you want insights for? "))
-                    export_format = input("Export as CSV or JSON? (csv/json): ").strip().lower()
-                    if export_format not in ("csv", "json"):
+                    export_format = input("Export as CSV, JSON or JSON Lines? (csv/json/jsonl): ").strip().lower()
+                    if export_format not in EXPORT_FORMATS:
                         export_format = "csv"
+                    incremental = input("Incremental sync (only fetch new and recent posts)? (y/N): ").strip().lower() in ("y", "yes")
                     # fetch IG account username for nicer output filename
-                    try:
-                        resp = requests.get(
-                            f"https://graph.facebook.com/v19.0/{config.IG_ID}",
-                            params={"fields": "username", "access_token": config.ACCESS_TOKEN},
-                            timeout=20,
-                        )
-                        username = resp.json().get("username")
-                    except Exception:
-                        username = None
+                    resp = get_client().get(config.IG_ID, params={"fields": "username"}, access_token=config.ACCESS_TOKEN, timeout=20)
+                    username = resp.get("username")
                     # pass username (IG username) so get_post_insights can use it for filenames
-                    get_post_insights(config.ACCESS_TOKEN, config.IG_ID, filename="instagram_insights.csv", n=n, export_format=export_format, username=username)
+                    get_post_insights(config.ACCESS_TOKEN, config.IG_ID, filename="instagram_insights.csv", n=n, export_format=export_format, username=username, incremental=incremental)
                 except Exception as e:
                     print(f"Invalid input: {e}")
 
@@ -103,6 +112,8 @@ def main_menu():
                 pass
             else:
                 try:
+                    from downloads import download_last_n_media
+
                     n = int(input("How many recent media do you want to download? "))
                     download_last_n_media(config.ACCESS_TOKEN, config.IG_ID, n=n, folder="media")
                 except Exception as e:
@@ -113,18 +124,18 @@ def main_menu():
                 pass
             else:
                 try:
+                    from business_discovery import get_insights_for_profile_business_discovery
+                    from exporters import EXPORT_FORMATS, EXTENSIONS, export_rows
+
                     url = input("Enter Instagram profile URL: ").strip()
                     n = int(input("How many recent posts do you want insights for? "))
-                    export_format = input("Export as CSV or JSON? (csv/json): ").strip().lower()
+                    export_format = input("Export as CSV, JSON or JSON Lines? (csv/json/jsonl): ").strip().lower()
                     rows = get_insights_for_profile_business_discovery(config.ACCESS_TOKEN, config.IG_ID, extract_username_from_url(url), n=n, export_format=export_format)
                     if rows:
-                        import pandas as pd
-                        df = pd.DataFrame(rows)
-                        fname = (extract_username_from_url(url) or "profile") + ("_insights.json" if export_format=="json" else "_insights.csv")
-                        if export_format == "json":
-                            df.to_json(fname, orient="records", force_ascii=False, indent=2)
-                        else:
-                            df.to_csv(fname, index=False, encoding="utf-8-sig")
+                        if export_format not in EXPORT_FORMATS:
+                            export_format = "csv"
+                        fname = (extract_username_from_url(url) or "profile") + "_insights" + EXTENSIONS[export_format]
+                        export_rows(rows, fname, export_format)
                         print(f"Exported to {fname}")
                 except Exception as e:
                     print(f"Invalid input: {e}")
@@ -134,6 +145,8 @@ def main_menu():
                 pass
             else:
                 try:
+                    from downloads import download_media_from_profile_business_discovery
+
                     url = input("Enter Instagram profile URL: ").strip()
                     n = int(input("How many recent media do you want to download? "))
                     download_media_from_profile_business_discovery(config.ACCESS_TOKEN, config.IG_ID, url, n=n, folder="media")
@@ -144,6 +157,8 @@ def main_menu():
                 pass
             else:
                 try:
+                    from get_references import get_references
+
                     username = str(input("username to get references for: "))
                     get_references(config.ACCESS_TOKEN, config.IG_ID, username)
                 except Exception as e:
@@ -153,10 +168,12 @@ def main_menu():
                 pass
             else:
                 try:
+                    from get_outliers import get_outliers
+
                     username = str(input("username to get references for: "))
-                    multiplier = float(input("multiplier from average likes: "))
+                    method, multiplier = ask_outlier_method()
                     n_media = int(input("number of media to analyse:  "))
-                    get_outliers(config.ACCESS_TOKEN, config.IG_ID, username,n_media, multiplier)
+                    get_outliers(config.ACCESS_TOKEN, config.IG_ID, username,n_media, multiplier, method=method)
                 except Exception as e:
                         tb = traceback.extract_tb(e.__traceback__)[-1]  # last traceback frame
                         print(f"❌ Invalid input on line {tb.lineno}: {e}")
@@ -173,9 +190,11 @@ def main_menu():
                         pass
                     else:
                         try:
-                            multiplier = float(input("multiplier from average likes: "))
+                            from get_outliers import get_outliers
+
+                            method, multiplier = ask_outlier_method()
                             n_media = int(input("number of media to analyse:  "))
-                            get_outliers(config.ACCESS_TOKEN, config.IG_ID, username, n_media, multiplier)
+                            get_outliers(config.ACCESS_TOKEN, config.IG_ID, username, n_media, multiplier, method=method)
                         except Exception as e:
                             tb = traceback.extract_tb(e.__traceback__)[-1]
                             print(f"❌ Error while running option 8 on line {tb.lineno}: {e}")
@@ -186,6 +205,8 @@ def main_menu():
                     pass
                 else:
                     try:
+                        from generate_report import generate_in_depth_report
+
                         generate_in_depth_report(config.ACCESS_TOKEN, config.IG_ID, username)
                         print(f"In-depth report generated for {username}.")
                     except Exception as e:
@@ -202,5 +223,37 @@ def main_menu():
         else:
             print("Invalid choice.")
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Instagram Insights CLI")
+    parser.add_argument("--no-cache", action="store_true", help="disable the on-disk Graph API response cache")
+    parser.add_argument("--refresh", action="store_true", help="ignore cached Graph responses (fresh ones are still stored)")
+    parser.add_argument("--cleanup-uploads", action="store_true", help="delete every Gemini upload this tool created, then exit")
+    return parser.parse_args(argv)
+
+
+def cleanup_uploads():
+    """Delete the Gemini Files API uploads recorded in the upload registry."""
+    from google import genai
+    from gemini_uploads import get_upload_registry
+
+    deleted = get_upload_registry().cleanup(genai.Client())
+    print(f"🧹 Deleted {deleted} Gemini uploads.")
+
+
 if __name__ == "__main__":
-    main_menu()
+    args = parse_args()
+    if args.no_cache:
+        config.RESPONSE_CACHE_ENABLED = False
+    config.RESPONSE_CACHE_REFRESH = args.refresh
+    if args.cleanup_uploads:
+        cleanup_uploads()
+        raise SystemExit(0)
+    try:
+        main_menu()
+    finally:
+        graph = get_client()
+        if graph.cache:
+            print(graph.cache.report())
+        if graph.governor:
+            print(graph.governor.report())
+        print(retry.report())
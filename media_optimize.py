@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+
+from PIL import Image
+
+import config
+from media_probe import IMAGE_EXTS, VIDEO_EXTS, get_probe
+
+# Proxies live in a hidden folder next to the originals (dot-folders are skipped when scanning media)
+OPTIMIZED_DIR = ".optimized"
+
+
+class OptimizeStats:
+    """Thread-safe tally of what the optimisation stage did, for the end-of-run report."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files = 0
+        self.optimized = 0
+        self.clipped = 0
+        self.skipped = 0
+        self.original_bytes = 0
+        self.upload_bytes = 0
+
+    def add(self, result: dict | None):
+        with self._lock:
+            self.files += 1
+            if result is None:
+                self.skipped += 1
+                return
+            self.original_bytes += result["original_bytes"]
+            self.upload_bytes += result["bytes"]
+            self.optimized += result["path"] != result["source"]
+            self.clipped += bool(result.get("clipped"))
+
+    def report(self) -> str:
+        saved = self.original_bytes - self.upload_bytes
+        pct = (saved / self.original_bytes * 100) if self.original_bytes else 0.0
+        return (
+            f"📉 Upload optimisation: {self.optimized}/{self.files} files optimised, {self.clipped} clipped, "
+            f"{self.skipped} skipped; {self.original_bytes / 1e6:.1f} MB -> {self.upload_bytes / 1e6:.1f} MB "
+            f"({saved / 1e6:.1f} MB saved, {pct:.0f}%)"
+        )
+
+
+def _proxy_path(path: str, ext: str, options) -> str:
+    """Proxy file name carrying a hash of the source's mtime/size and the options, so stale proxies are never reused."""
+    st = os.stat(path)
+    digest = hashlib.sha256(json.dumps([st.st_mtime_ns, st.st_size, options]).encode("utf-8")).hexdigest()[:10]
+    folder = os.path.join(os.path.dirname(path), OPTIMIZED_DIR)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(folder, f"{stem}.{digest}{ext}")
+
+
+def _result(source, path, clipped=False):
+    return {"source": source, "path": path, "original_bytes": os.path.getsize(source), "bytes": os.path.getsize(path), "clipped": clipped}
+
+
+def optimize_image(path: str, max_side: int | None = None, quality: int | None = None) -> dict:
+    """Downscale an image to `max_side` and re-encode it as JPEG; keeps the original if that is not smaller."""
+    max_side = max_side or config.UPLOAD_IMAGE_MAX_SIDE
+    quality = quality or config.UPLOAD_IMAGE_QUALITY
+    out = _proxy_path(path, ".jpg", ["image", max_side, quality])
+    if not os.path.exists(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        with Image.open(path) as img:
+            img.draft("RGB", (max_side, max_side))
+            img = img.convert("RGB")
+            if max(img.size) > max_side:
+                img.thumbnail((max_side, max_side), Image.BICUBIC)
+            img.save(out + ".part", "JPEG", quality=quality, optimize=True)
+        os.replace(out + ".part", out)
+    if os.path.getsize(out) >= os.path.getsize(path):
+        return _result(path, path)
+    return _result(path, out)
+
+
+def optimize_video(path: str, duration: float | None = None) -> dict | None:
+    """
+    Transcode a video to a low-bitrate H.264/AAC proxy (at most UPLOAD_VIDEO_MAX_HEIGHT lines,
+    UPLOAD_VIDEO_FPS, UPLOAD_VIDEO_CRF) keeping only the first MAX_UPLOAD_VIDEO_SECONDS.
+    Without ffmpeg, or if it fails, the original is used when it is short enough; None means skip.
+    """
+    max_seconds = config.MAX_UPLOAD_VIDEO_SECONDS
+    too_long = duration is None or duration > max_seconds
+    if not shutil.which("ffmpeg"):
+        return None if too_long else _result(path, path)
+
+    options = ["video", max_seconds, config.UPLOAD_VIDEO_MAX_HEIGHT, config.UPLOAD_VIDEO_FPS, config.UPLOAD_VIDEO_CRF]
+    out = _proxy_path(path, ".mp4", options)
+    if not os.path.exists(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        height = config.UPLOAD_VIDEO_MAX_HEIGHT
+        cmd = [
+            "ffmpeg", "-v", "error", "-y", "-i", path, "-t", str(max_seconds),
+            "-vf", f"scale=-2:'min({height},ih)'", "-r", str(config.UPLOAD_VIDEO_FPS),
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", str(config.UPLOAD_VIDEO_CRF),
+            "-c:a", "aac", "-b:a", "64k", "-ac", "1", "-movflags", "+faststart", "-f", "mp4", out + ".part",
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=config.UPLOAD_TRANSCODE_TIMEOUT)
+            ok = result.returncode == 0
+            error = result.stderr.strip()
+        except (OSError, subprocess.TimeoutExpired) as e:
+            ok, error = False, str(e)
+        if not ok:
+            if os.path.exists(out + ".part"):
+                os.remove(out + ".part")
+            print(f"⚠️ ffmpeg could not transcode {os.path.basename(path)}: {error[-200:]}")
+            return None if too_long else _result(path, path)
+        os.replace(out + ".part", out)
+
+    clipped = duration is not None and duration > max_seconds
+    if os.path.getsize(out) >= os.path.getsize(path) and not too_long:
+        return _result(path, path)
+    return _result(path, out, clipped=clipped)
+
+
+def optimize_for_upload(path: str, info: dict | None = None) -> dict | None:
+    """
+    Pick what to upload for `path`: a downscaled image, a (clipped) video proxy, or the file
+    itself (PDFs are already downscaled by pdf_merge). `info` is a media_probe result.
+    Returns {"source", "path", "original_bytes", "bytes", "clipped"}, or None to skip the file.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext in IMAGE_EXTS:
+            return optimize_image(path)
+        if ext in VIDEO_EXTS:
+            info = info or get_probe().probe(path)
+            return optimize_video(path, info.get("duration"))
+    except Exception as e:
+        print(f"⚠️ Could not optimise {os.path.basename(path)} ({e}); uploading the original.")
+    return _result(path, path)
@@ -0,0 +1,141 @@
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from file_utils import atomic_write_json, read_json
+
+VIDEO_EXTS = {".mp4", ".mov", ".m4v", ".webm"}
+AUDIO_EXTS = {".mp3", ".m4a", ".wav", ".aac"}
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def _file_signature(path: str):
+    """(mtime_ns, size) of `path`; a probe result is reused only while both are unchanged."""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _ffprobe(path: str, timeout: float) -> dict:
+    """Duration, codecs and resolution of an audio/video file via one ffprobe call."""
+    result = subprocess.run(
+        [
+            "ffprobe", "-v", "error",
+            "-show_entries", "format=duration,format_name:stream=codec_type,codec_name,width,height",
+            "-of", "json", path,
+        ],
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ffprobe exited with {result.returncode}")
+    data = json.loads(result.stdout or "{}")
+    fmt = data.get("format", {})
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+    duration = fmt.get("duration")
+    return {
+        "duration": float(duration) if duration not in (None, "N/A") else None,
+        "format": fmt.get("format_name"),
+        "video_codec": video.get("codec_name"),
+        "audio_codec": audio.get("codec_name"),
+        "width": video.get("width"),
+        "height": video.get("height"),
+    }
+
+
+def _image_info(path: str) -> dict:
+    """Resolution and format of an image (PIL only reads the header)."""
+    from PIL import Image
+
+    with Image.open(path) as img:
+        return {"duration": None, "format": (img.format or "").lower(), "width": img.width, "height": img.height}
+
+
+class MediaProbe:
+    """
+    Concurrent, cached media metadata (duration, codecs, resolution, size).
+    Results are stored in CACHE_DIR/media_probe.json keyed by absolute path and reused
+    while the file's mtime and size are unchanged, so re-runs skip ffprobe entirely.
+    Failed probes (e.g. ffprobe missing) are returned with an `error` but not cached.
+    """
+
+    def __init__(self, path: str | None = None, max_workers: int | None = None, timeout: float | None = None):
+        self.path = path or os.path.join(config.CACHE_DIR, "media_probe.json")
+        self.max_workers = max_workers or config.PROBE_WORKERS
+        self.timeout = timeout or config.PROBE_TIMEOUT
+        self._entries = read_json(self.path, {}) or {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def _probe_uncached(self, path: str) -> dict:
+        ext = os.path.splitext(path)[1].lower()
+        info = {"duration": None, "format": None, "width": None, "height": None}
+        try:
+            if ext in VIDEO_EXTS or ext in AUDIO_EXTS:
+                info.update(_ffprobe(path, self.timeout))
+            elif ext in IMAGE_EXTS:
+                info.update(_image_info(path))
+        except Exception as e:
+            info["error"] = f"{type(e).__name__}: {e}"
+        return info
+
+    def probe(self, path: str) -> dict:
+        """Metadata for one file (from the cache when the file is unchanged)."""
+        key = os.path.abspath(path)
+        try:
+            mtime_ns, size = _file_signature(path)
+        except OSError as e:
+            return {"duration": None, "size": None, "error": str(e)}
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached and cached.get("mtime_ns") == mtime_ns and cached.get("size") == size:
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        info = self._probe_uncached(path)
+        info.update({"size": size, "mtime_ns": mtime_ns})
+        if "error" not in info:
+            with self._lock:
+                self._entries[key] = info
+                self._dirty = True
+        return info
+
+    def probe_many(self, paths) -> dict:
+        """Probe `paths` concurrently (max_workers ffprobe processes); returns {path: info}."""
+        paths = list(dict.fromkeys(paths))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = dict(zip(paths, pool.map(self.probe, paths)))
+        self.save()
+        return results
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            # Forget files that no longer exist so the cache does not grow forever
+            self._entries = {k: v for k, v in self._entries.items() if os.path.exists(k)}
+            atomic_write_json(self.path, self._entries)
+            self._dirty = False
+
+
+_probe = None
+_probe_lock = threading.Lock()
+
+
+def get_probe() -> MediaProbe:
+    """Return the process-wide MediaProbe, creating it on first use."""
+    global _probe
+    if _probe is None:
+        with _probe_lock:
+            if _probe is None:
+                _probe = MediaProbe()
+    return _probe
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import re
+import threading
+
+from file_utils import atomic_write_json, read_json, sha256_file
+
+MANIFEST_NAME = ".media_store.json"
+CHUNK_SIZE = 64 * 1024
+
+
+class IncompleteDownloadError(ConnectionError):
+    """The transfer ended before the announced size; retrying resumes from the .part file."""
+
+
+class MediaStore:
+    """
+    Resumable media store for one folder.
+    Entries are keyed by media/child ID and record {filename, size, sha256} in
+    `{folder}/.media_store.json`. Files are downloaded to `<name>.part` and only
+    renamed into place once complete, so a crash never leaves a truncated jpg/mp4
+    behind; an interrupted `.part` is resumed with an HTTP Range request next time.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.manifest_path = os.path.join(folder, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._entries = read_json(self.manifest_path, default={}) or {}
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.folder, filename)
+
+    def is_complete(self, key: str, filename: str, verify: bool = False) -> bool:
+        """True if `key` was stored as `filename` and the file on disk still matches its size (and checksum if `verify`)."""
+        entry = self._entries.get(key)
+        if not entry or entry.get("filename") != filename:
+            return False
+        path = self.path(filename)
+        if not os.path.isfile(path) or os.path.getsize(path) != entry.get("size"):
+            return False
+        return not verify or sha256_file(path) == entry.get("sha256")
+
+    def fetch(self, client, url: str, key: str, filename: str) -> dict:
+        """
+        Download `url` into the store unless `key` is already complete.
+        Returns {"bytes": transferred this call, "size": final size, "skipped", "resumed"}.
+        """
+        path = self.path(filename)
+        if self.is_complete(key, filename):
+            return {"bytes": 0, "size": os.path.getsize(path), "skipped": True, "resumed": False}
+
+        os.makedirs(self.folder, exist_ok=True)
+        part = path + ".part"
+        offset = os.path.getsize(part) if os.path.isfile(part) else 0
+        h = hashlib.sha256()
+        transferred = 0
+        resumed = False
+
+        headers = {"Range": f"bytes={offset}-"} if offset else None
+        with client.stream(url, headers=headers) as r:
+            start = _range_start(r) if r.status_code == 206 else 0
+            if offset and (r.status_code == 416 or (r.status_code == 206 and start != offset)):
+                # A range other than the one asked for, or one the server cannot satisfy:
+                # drop the partial file and fetch the whole file without a Range header
+                os.remove(part)
+                return self.fetch(client, url, key, filename)
+            if not offset and start != 0:
+                raise IOError(f"unexpected partial response (Content-Range starts at {start}) for {url}")
+            r.raise_for_status()
+            if r.status_code != 206:
+                offset = 0  # the server ignored the Range header and sent the whole file
+            expected = _expected_size(r)
+            if offset:
+                resumed = True
+                with open(part, "rb") as f:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                        h.update(chunk)
+                mode = "ab"
+            else:
+                mode = "wb"
+
+            with open(part, mode) as f:
+                for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    h.update(chunk)
+                    transferred += len(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+
+        size = os.path.getsize(part)
+        if expected is not None and size != expected:
+            if size > expected:
+                os.remove(part)  # misaligned data, a resume would only make it worse
+            raise IncompleteDownloadError(f"incomplete download of {filename}: {size} of {expected} bytes")
+        os.replace(part, path)
+        self._record(key, {"filename": filename, "size": size, "sha256": h.hexdigest()})
+        return {"bytes": transferred, "size": size, "skipped": False, "resumed": resumed}
+
+    def _record(self, key: str, entry: dict):
+        with self._lock:
+            self._entries[key] = entry
+            atomic_write_json(self.manifest_path, self._entries)
+
+
+def _range_start(resp):
+    """Start offset from a 206 response's Content-Range header (None if absent)."""
+    match = re.match(r"bytes (\d+)-", resp.headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else None
+
+
+def _expected_size(resp):
+    """
+    Full file size announced by the response: the total of a 206's Content-Range, or the
+    Content-Length of an uncompressed 200. None when the server does not say.
+    """
+    if resp.status_code == 206:
+        match = re.match(r"bytes \d+-\d+/(\d+)", resp.headers.get("Content-Range", ""))
+        return int(match.group(1)) if match else None
+    if resp.headers.get("Content-Encoding", "identity") not in ("", "identity"):
+        return None  # Content-Length counts compressed bytes, iter_content yields decoded ones
+    length = resp.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else None
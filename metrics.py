@@ -0,0 +1,76 @@
+import numpy as np
+
+# Custom engagement rates (see prompt.txt): name -> (numerator metrics, denominator metric)
+ENGAGEMENT_RATES = {
+    "self_rate": (("saved",), "likes"),
+    "social_rate": (("comments",), "likes"),
+    "relatability_rate": (("likes", "shares"), "reach"),
+}
+
+
+def column(records, key, fallback=None) -> np.ndarray:
+    """
+    Float array of `key` across `records` (optionally falling back to `fallback` key).
+    Missing, None or non-numeric values become NaN.
+    """
+    raw = [record.get(key) for record in records]
+    if fallback:
+        raw = [record.get(fallback) if value is None else value for value, record in zip(raw, records)]
+    try:
+        # Fast path: plain numbers and None
+        return np.array([np.nan if value is None else value for value in raw], dtype=float)
+    except (TypeError, ValueError):
+        pass
+
+    values = np.empty(len(records), dtype=float)
+    for i, record in enumerate(records):
+        value = record.get(key)
+        if value is None and fallback:
+            value = record.get(fallback)
+        try:
+            values[i] = float(value)
+        except (TypeError, ValueError):
+            values[i] = np.nan
+    return values
+
+
+def columns(records, keys) -> dict:
+    return {key: column(records, key) for key in keys}
+
+
+def engagement_rates(cols: dict) -> dict:
+    """
+    Compute every ENGAGEMENT_RATES entry for a whole batch at once.
+    A rate is NaN when any input is missing and 0.0 when its denominator is 0.
+    """
+    n = len(next(iter(cols.values()))) if cols else 0
+    rates = {}
+    for name, (numerators, denominator) in ENGAGEMENT_RATES.items():
+        num = np.zeros(n)
+        for key in numerators:
+            num = num + cols.get(key, np.full(n, np.nan))
+        den = cols.get(denominator, np.full(n, np.nan))
+        out = np.zeros(n)
+        np.divide(num, den, out=out, where=den > 0)
+        out[np.isnan(num) | np.isnan(den)] = np.nan
+        rates[name] = out
+    return rates
+
+
+def add_engagement_rates(records):
+    """Add self/social/relatability rates to each record in place (missing inputs -> None)."""
+    if not records:
+        return records
+    keys = {k for numerators, den in ENGAGEMENT_RATES.values() for k in numerators + (den,)}
+    rates = engagement_rates(columns(records, keys))
+    for name, values in rates.items():
+        for record, value in zip(records, values.tolist()):
+            record[name] = None if value != value else value  # NaN -> None
+    return records
+
+
+def nan_mean(values: np.ndarray) -> float:
+    """Mean ignoring NaN (0.0 for an empty or all-NaN batch)."""
+    if values.size == 0 or np.isnan(values).all():
+        return 0.0
+    return float(np.nanmean(values))
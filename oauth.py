@@ -1,9 +1,9 @@
 import sys
 import urllib.parse
 import webbrowser
-import requests
 import json
-from config import APP_ID, APP_SECRET, REDIRECT_URI
+from config import APP_ID, APP_SECRET, REDIRECT_URI, GRAPH_API_VERSION
+from graph_client import get_client
 
 def _print_json(title: str, obj):
     try:
@@ -29,7 +29,7 @@ def oauth_flow() -> str:
     ]
 
     auth_url = (
-        "https://www.facebook.com/v24.0/dialog/oauth?"
+        f"https://www.facebook.com/{GRAPH_API_VERSION}/dialog/oauth?"
         f"client_id={APP_ID}"
         f"&redirect_uri={urllib.parse.quote(REDIRECT_URI, safe='')}"
         f"&scope={','.join(scopes)}"
@@ -50,28 +50,25 @@ def oauth_flow() -> str:
         print("No code provided.")
         sys.exit(1)
 
-    token_url = (
-        "https://graph.facebook.com/v19.0/oauth/access_token"
-        f"?client_id={APP_ID}"
-        f"&redirect_uri={urllib.parse.quote(REDIRECT_URI, safe='')}"
-        f"&client_secret={APP_SECRET}"
-        f"&code={code}"
-    )
-    short = requests.get(token_url, timeout=30).json()
+    graph = get_client()
+    short = graph.get("oauth/access_token", params={
+        "client_id": APP_ID,
+        "redirect_uri": REDIRECT_URI,
+        "client_secret": APP_SECRET,
+        "code": code,
+    })
     _print_json("Short-lived token response", short)
     access_token = short.get("access_token")
     if not access_token:
         print("Failed to obtain short-lived access token.")
         sys.exit(1)
 
-    long_token_url = (
-        "https://graph.facebook.com/v19.0/oauth/access_token"
-        f"?grant_type=fb_exchange_token"
-        f"&client_id={APP_ID}"
-        f"&client_secret={APP_SECRET}"
-        f"&fb_exchange_token={access_token}"
-    )
-    long_data = requests.get(long_token_url, timeout=30).json()
+    long_data = graph.get("oauth/access_token", params={
+        "grant_type": "fb_exchange_token",
+        "client_id": APP_ID,
+        "client_secret": APP_SECRET,
+        "fb_exchange_token": access_token,
+    })
 
     user_token = long_data.get("access_token") or access_token
     return user_token
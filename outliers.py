@@ -0,0 +1,150 @@
+import bisect
+import math
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from metrics import column
+
+METHODS = ("mean", "mad", "percentile")
+# Default threshold per method: likes / mean, robust z-score, percentile rank
+DEFAULT_THRESHOLDS = {"mean": 2.0, "mad": 3.5, "percentile": 95.0}
+# MAD -> standard deviation for normally distributed data; IQR -> standard deviation
+_MAD_SCALE = 1.4826
+_IQR_SCALE = 1.349
+
+
+def _baseline_scores(values: np.ndarray, method: str) -> np.ndarray:
+    """Score every value against the baseline formed by `values` itself (NaN stays NaN)."""
+    scores = np.full(len(values), np.nan)
+    valid = ~np.isnan(values)
+    base = values[valid]
+    if base.size == 0:
+        return scores
+
+    if method == "mean":
+        mean = base.mean()
+        scores[valid] = base / mean if mean > 0 else 0.0
+    elif method == "mad":
+        median = np.median(base)
+        scale = _MAD_SCALE * np.median(np.abs(base - median))
+        if scale == 0:
+            # More than half the posts share one value: fall back to mean absolute deviation
+            scale = 1.2533 * np.mean(np.abs(base - median))
+        scores[valid] = (base - median) / scale if scale > 0 else 0.0
+    elif method == "percentile":
+        ordered = np.sort(base)
+        scores[valid] = np.searchsorted(ordered, base, side="right") / ordered.size * 100
+    else:
+        raise ValueError(f"Unknown outlier method: {method} (expected one of {METHODS})")
+    return scores
+
+
+def post_timestamps(records, key="timestamp") -> np.ndarray:
+    """Unix timestamps of Graph `timestamp` fields (NaN when missing or unparsable)."""
+    out = np.full(len(records), np.nan)
+    for i, record in enumerate(records):
+        try:
+            out[i] = datetime.strptime(record.get(key), "%Y-%m-%dT%H:%M:%S%z").timestamp()
+        except (TypeError, ValueError):
+            pass
+    return out
+
+
+def score_posts(records, likes_key: str, method: str = "mean", by_type: bool = False, window_days: float | None = None) -> np.ndarray:
+    """
+    Outlier score for every post in `records` (NaN when it has no like count).
+
+    - method "mean": likes / mean likes (the legacy multiplier test).
+    - method "mad": robust z-score (likes - median) / (1.4826 * MAD); one viral post
+      barely moves the baseline.
+    - method "percentile": percentile rank of the post's likes (0-100).
+    `by_type` computes a separate baseline per media_type. `window_days` switches to a
+    rolling baseline: each post is scored against the posts published in the preceding
+    `window_days` (see RollingBaseline), in O(n log n).
+    """
+    values = column(records, likes_key)
+    types = np.asarray([str(r.get("media_type") or "") for r in records]) if by_type else np.zeros(len(records), dtype=str)
+    scores = np.full(len(records), np.nan)
+
+    for media_type in np.unique(types):
+        idx = np.flatnonzero(types == media_type)
+        if window_days is None:
+            scores[idx] = _baseline_scores(values[idx], method)
+            continue
+
+        # Rolling: walk the group oldest -> newest, score each post before adding it
+        ts = post_timestamps([records[i] for i in idx])
+        order = idx[np.argsort(np.nan_to_num(ts, nan=-np.inf), kind="stable")]
+        baseline = RollingBaseline(window_days, method)
+        ts_by_index = dict(zip(idx.tolist(), ts.tolist()))
+        scores[order] = [baseline.update(values[i], ts_by_index[i]) for i in order.tolist()]
+    return scores
+
+
+def select_outliers(scores: np.ndarray, method: str = "mean", threshold: float | None = None) -> np.ndarray:
+    """Boolean mask of scores above the method's threshold (percentile: at or above)."""
+    threshold = DEFAULT_THRESHOLDS[method] if threshold is None else threshold
+    with np.errstate(invalid="ignore"):
+        return scores >= threshold if method == "percentile" else scores > threshold
+
+
+class RollingBaseline:
+    """
+    Like-count baseline over a sliding time window, updated one post at a time.
+    Posts may arrive oldest-first or newest-first; anything further than `window_days`
+    from the latest arrival is evicted. Values live in a sorted list (bisect), so the
+    median and quartiles are O(1) reads and each update is O(log n) comparisons.
+    With `window_days=None` the baseline covers every post seen so far; with a window,
+    posts without a timestamp are scored but never added to it.
+    For "mad" the scale comes from the interquartile range (IQR / 1.349), the streaming
+    stand-in for MAD that needs no second pass over the window.
+    """
+
+    def __init__(self, window_days: float | None = None, method: str = "mean"):
+        if method not in METHODS:
+            raise ValueError(f"Unknown outlier method: {method} (expected one of {METHODS})")
+        self.window = window_days * 86400 if window_days else None
+        self.method = method
+        self._sorted = []
+        self._window = deque()
+        self._sum = 0.0
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def add(self, value: float, ts: float | None = None):
+        if value is None or math.isnan(value):
+            return
+        value = float(value)
+        if self.window is not None:
+            if ts is None or math.isnan(ts):
+                return  # no timestamp, no place in a time window (it would never be evicted)
+            while self._window and abs(ts - self._window[0][1]) > self.window:
+                old, _ = self._window.popleft()
+                del self._sorted[bisect.bisect_left(self._sorted, old)]
+                self._sum -= old
+        self._window.append((value, ts))
+        bisect.insort(self._sorted, value)
+        self._sum += value
+
+    def score(self, value: float) -> float:
+        """Score `value` against the current window (NaN if the window is empty)."""
+        n = len(self._sorted)
+        if value is None or math.isnan(value) or n == 0:
+            return np.nan
+        if self.method == "mean":
+            mean = self._sum / n
+            return value / mean if mean > 0 else 0.0
+        if self.method == "percentile":
+            return bisect.bisect_right(self._sorted, value) / n * 100
+        median = self._sorted[n // 2] if n % 2 else (self._sorted[n // 2 - 1] + self._sorted[n // 2]) / 2
+        scale = (self._sorted[(3 * n) // 4] - self._sorted[n // 4]) / _IQR_SCALE
+        return (value - median) / scale if scale > 0 else 0.0
+
+    def update(self, value: float, ts: float | None = None) -> float:
+        """Score `value` against the posts before it, then add it to the window."""
+        score = self.score(value)
+        self.add(value, ts)
+        return score
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+import config
+
+
+def _signature_path(output_path: str) -> str:
+    """Hidden sidecar next to the PDF (dot-files are ignored when scanning media folders)."""
+    folder, name = os.path.split(output_path)
+    return os.path.join(folder, f".{name}.sig")
+
+
+def merge_signature(image_paths, max_side: int, dpi: float, quality: int) -> str:
+    """Fingerprint of a merge: input paths in order, their mtime/size, and the output options."""
+    parts = []
+    for path in image_paths:
+        st = os.stat(path)
+        parts.append([os.path.abspath(path), st.st_mtime_ns, st.st_size])
+    payload = json.dumps([parts, max_side, dpi, quality])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _load_page(path: str, max_side: int):
+    """Open one slide as RGB, decoding JPEGs at reduced scale when they are larger than `max_side`."""
+    img = Image.open(path)
+    if max_side:
+        img.draft("RGB", (max_side, max_side))  # JPEG only: DCT scaling while decoding
+    img = img.convert("RGB")
+    if max_side and max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.BICUBIC)
+    return img
+
+
+def merge_images_to_pdf(image_paths, output_path, max_side=None, dpi=None, quality=None, force=False):
+    """
+    Merge images into a multi-page PDF, one page at a time (only one decoded slide in
+    memory). Slides larger than `max_side` pixels are downscaled and every page is
+    JPEG-encoded at `quality` and tagged with `dpi`. The PDF is written to a temp file
+    and renamed into place. If the inputs and options match the previous merge (hidden
+    `.sig` sidecar) the existing PDF is kept. Returns (output_path, skipped).
+    """
+    max_side = config.PDF_MAX_SIDE if max_side is None else max_side
+    dpi = dpi or config.PDF_DPI
+    quality = quality or config.PDF_JPEG_QUALITY
+
+    signature = merge_signature(image_paths, max_side, dpi, quality)
+    sig_path = _signature_path(output_path)
+    if not force and os.path.exists(output_path) and os.path.exists(sig_path):
+        with open(sig_path, "r", encoding="utf-8") as f:
+            if f.read().strip() == signature:
+                return output_path, True
+
+    tmp_path = output_path + ".part"
+    try:
+        for i, path in enumerate(image_paths):
+            with _load_page(path, max_side) as page:
+                page.save(tmp_path, "PDF", resolution=dpi, quality=quality, append=i > 0)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    with open(sig_path, "w", encoding="utf-8") as f:
+        f.write(signature)
+    return output_path, False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    Process pool shared by every carousel merge (PDF_MERGE_WORKERS processes).
+    Uses "spawn" so workers start clean even though the caller runs threads.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = config.PDF_MERGE_WORKERS or os.cpu_count() or 1
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def merge_in_pool(image_paths, output_path, **options):
+    """Submit merge_images_to_pdf to the shared process pool; returns a Future of (path, skipped)."""
+    return get_pool().submit(merge_images_to_pdf, list(image_paths), output_path, **options)
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -0,0 +1,87 @@
+import queue
+import threading
+
+import config
+
+_DONE = object()
+
+
+class Stage:
+    """
+    One step of a streaming pipeline.
+    `fn(item)` returns an iterable of zero or more outputs (so a stage can filter,
+    transform or fan out); `workers` threads run it concurrently.
+    """
+
+    def __init__(self, name: str, fn, workers: int = 1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+
+
+def run_pipeline(source, stages, maxsize: int | None = None) -> list:
+    """
+    Stream items from the `source` iterable through `stages`, each stage on its own
+    worker threads, connected by bounded queues of `maxsize` items. A slow stage
+    back-pressures the ones before it, so memory stays flat however many items flow.
+    An exception while processing one item is printed and only drops that item.
+    Returns the outputs of the last stage (in completion order).
+    """
+    maxsize = maxsize or config.PIPELINE_QUEUE_SIZE
+    queues = [queue.Queue(maxsize=maxsize) for _ in stages]
+    results = []
+    results_lock = threading.Lock()
+    threads = []
+
+    def feed():
+        try:
+            for item in source:
+                queues[0].put(item)
+        except Exception as e:
+            print(f"❌ Pipeline source failed: {e}")
+        finally:
+            for _ in range(stages[0].workers):
+                queues[0].put(_DONE)
+
+    def make_worker(idx, stage, remaining):
+        in_q = queues[idx]
+        out_q = queues[idx + 1] if idx + 1 < len(stages) else None
+
+        def emit(out):
+            if out_q is not None:
+                out_q.put(out)
+            else:
+                with results_lock:
+                    results.append(out)
+
+        def work():
+            while True:
+                item = in_q.get()
+                if item is _DONE:
+                    break
+                try:
+                    for out in stage.fn(item) or ():
+                        emit(out)
+                except Exception as e:
+                    print(f"❌ Pipeline stage '{stage.name}' failed: {e}")
+            # last worker of this stage to finish closes the next queue
+            with remaining["lock"]:
+                remaining["count"] -= 1
+                last = remaining["count"] == 0
+            if last and out_q is not None:
+                for _ in range(stages[idx + 1].workers):
+                    out_q.put(_DONE)
+
+        return work
+
+    threads.append(threading.Thread(target=feed, name="pipeline-source", daemon=True))
+    for idx, stage in enumerate(stages):
+        remaining = {"count": stage.workers, "lock": threading.Lock()}
+        for w in range(stage.workers):
+            threads.append(threading.Thread(target=make_worker(idx, stage, remaining), name=f"pipeline-{stage.name}-{w}", daemon=True))
+
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
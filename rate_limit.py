@@ -0,0 +1,231 @@
+import hashlib
+import json
+import threading
+import time
+
+import config
+
+# Graph error codes that mean "slow down": app (4), user (17), page (32), custom (613)
+# and Business Use Case limits (80001-80014; 80002 is Instagram)
+APP_THROTTLE_CODES = {4}
+SCOPE_THROTTLE_CODES = {17, 32, 613} | set(range(80001, 80015))
+THROTTLE_CODES = APP_THROTTLE_CODES | SCOPE_THROTTLE_CODES
+
+
+def parse_app_usage(header: str | None) -> float | None:
+    """Highest percentage in an X-App-Usage header ({"call_count": 28, "total_time": 25, ...})."""
+    if not header:
+        return None
+    try:
+        usage = json.loads(header)
+        return float(max(v for v in usage.values() if isinstance(v, (int, float))))
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_business_usage(header: str | None) -> dict:
+    """
+    X-Business-Use-Case-Usage -> {business_id: (highest percentage, seconds until access is regained)}.
+    The header maps each business id to a list of per-use-case usage objects.
+    """
+    if not header:
+        return {}
+    try:
+        usage = json.loads(header)
+    except ValueError:
+        return {}
+    out = {}
+    for business_id, entries in usage.items():
+        pct, regain = 0.0, 0.0
+        for entry in entries if isinstance(entries, list) else [entries]:
+            if not isinstance(entry, dict):
+                continue
+            pct = max([pct] + [float(entry[k]) for k in ("call_count", "total_time", "total_cputime") if isinstance(entry.get(k), (int, float))])
+            # estimated_time_to_regain_access is in minutes
+            regain = max(regain, float(entry.get("estimated_time_to_regain_access") or 0) * 60)
+        out[str(business_id)] = (pct, regain)
+    return out
+
+
+class TokenBucket:
+    """
+    Classic token bucket (`capacity` burst, refilled at `rate` tokens/s) that can
+    also be paused outright until a given monotonic time.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.usage = None
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available (0 if one is available now)."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class RateLimitGovernor:
+    """
+    Paces Graph calls from the usage headers Graph returns.
+    One token bucket covers the app (X-App-Usage) and one each business account
+    (X-Business-Use-Case-Usage). Below RATE_LIMIT_SOFT_PCT usage buckets refill at the
+    full RATE_LIMIT_RPS; above it the rate shrinks with the remaining headroom, and at
+    RATE_LIMIT_HARD_PCT (or on a throttling error) the bucket pauses until Graph says
+    access is regained, or for an exponential backoff if it doesn't say.
+    Business accounts are linked to the access token that reported them, so a call only
+    waits on the buckets of the token it uses.
+    """
+
+    def __init__(self, rate=None, burst=None, soft_pct=None, hard_pct=None):
+        self.rate = rate or config.RATE_LIMIT_RPS
+        self.burst = burst or config.RATE_LIMIT_BURST
+        self.soft_pct = config.RATE_LIMIT_SOFT_PCT if soft_pct is None else soft_pct
+        self.hard_pct = config.RATE_LIMIT_HARD_PCT if hard_pct is None else hard_pct
+        self._lock = threading.Lock()
+        self._buckets = {"app": TokenBucket(self.rate, self.burst)}
+        self._scopes = {}  # token hash -> business ids seen for it
+        self._strikes = {}  # bucket -> consecutive throttling errors
+        self.calls = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.throttles = 0
+
+    @staticmethod
+    def _scope(access_token) -> str | None:
+        return hashlib.sha256(access_token.encode("utf-8")).hexdigest()[:16] if access_token else None
+
+    def _bucket_names(self, scope) -> list:
+        return ["app"] + [f"business:{b}" for b in self._scopes.get(scope, ())]
+
+    def _bucket(self, name: str) -> TokenBucket:
+        if name not in self._buckets:
+            self._buckets[name] = TokenBucket(self.rate, self.burst)
+        return self._buckets[name]
+
+    def acquire(self, access_token=None):
+        """Block until the app bucket and the token's business buckets all have a token."""
+        scope = self._scope(access_token)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                buckets = [self._bucket(n) for n in self._bucket_names(scope)]
+                wait = max(b.wait_time(now) for b in buckets)
+                if wait <= 0:
+                    for b in buckets:
+                        b.take()
+                    self.calls += 1
+                    if waited:
+                        self.waits += 1
+                        self.wait_seconds += waited
+                    return waited
+            time.sleep(wait)
+            waited += wait
+
+    def _set_usage(self, name: str, pct: float, regain: float = 0.0):
+        """Adapt one bucket to a reported usage percentage (caller holds the lock)."""
+        bucket = self._bucket(name)
+        previous = bucket.usage
+        bucket.usage = pct
+        if pct >= self.hard_pct:
+            pause = regain or 60.0
+            bucket.paused_until = max(bucket.paused_until, time.monotonic() + pause)
+            bucket.rate = bucket.base_rate * 0.05
+            print(f"🛑 Graph {name} usage at {pct:.0f}%: pausing {pause:.0f}s")
+        elif pct > self.soft_pct:
+            headroom = (self.hard_pct - pct) / (self.hard_pct - self.soft_pct)
+            bucket.rate = bucket.base_rate * max(0.05, headroom)
+            if previous is None or previous <= self.soft_pct or abs(pct - previous) >= 10:
+                print(f"🐢 Graph {name} usage at {pct:.0f}%: pacing to {bucket.rate:.1f} req/s")
+        else:
+            if previous is not None and previous > self.soft_pct:
+                print(f"🐇 Graph {name} usage back to {pct:.0f}%: full speed")
+            bucket.rate = bucket.base_rate
+
+    def observe(self, headers, access_token=None):
+        """Update the buckets from a response's usage headers."""
+        app = parse_app_usage(headers.get("x-app-usage"))
+        business = parse_business_usage(headers.get("x-business-use-case-usage"))
+        if app is None and not business:
+            return
+        scope = self._scope(access_token)
+        with self._lock:
+            if app is not None:
+                self._set_usage("app", app)
+            for business_id, (pct, regain) in business.items():
+                if scope:
+                    self._scopes.setdefault(scope, set()).add(business_id)
+                self._set_usage(f"business:{business_id}", pct, regain)
+
+    def throttled(self, code, headers=None, access_token=None) -> float:
+        """
+        Record a throttling error and pause the bucket(s) it applies to.
+        Returns the pause in seconds (exponential per bucket unless Graph gives a regain time).
+        """
+        business = parse_business_usage((headers or {}).get("x-business-use-case-usage"))
+        scope = self._scope(access_token)
+        with self._lock:
+            self.throttles += 1
+            if code in APP_THROTTLE_CODES or not (business or self._scopes.get(scope)):
+                names = ["app"]
+            else:
+                for business_id in business:
+                    if scope:
+                        self._scopes.setdefault(scope, set()).add(business_id)
+                names = [n for n in self._bucket_names(scope) if n != "app"]
+            regain = max([r for _, r in business.values()] + [0.0])
+            pause = 0.0
+            for name in names:
+                strikes = self._strikes.get(name, 0)
+                self._strikes[name] = strikes + 1
+                wait = regain or min(config.RATE_LIMIT_MAX_WAIT, 30.0 * 2 ** strikes)
+                bucket = self._bucket(name)
+                bucket.paused_until = max(bucket.paused_until, time.monotonic() + wait)
+                bucket.rate = bucket.base_rate * 0.05
+                pause = max(pause, wait)
+            print(f"🛑 Graph throttling (code {code}) on {', '.join(names)}: pausing {pause:.0f}s")
+            return pause
+
+    def succeeded(self, access_token=None):
+        """Reset the backoff strikes of the buckets a successful call went through."""
+        if not self._strikes:
+            return
+        with self._lock:
+            for name in self._bucket_names(self._scope(access_token)):
+                self._strikes.pop(name, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "calls": self.calls,
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "throttles": self.throttles,
+                "buckets": {
+                    name: {
+                        "usage_pct": b.usage,
+                        "rate": round(b.rate, 3),
+                        "paused_for": round(max(0.0, b.paused_until - now), 1),
+                    }
+                    for name, b in self._buckets.items()
+                },
+            }
+
+    def report(self) -> str:
+        s = self.stats()
+        usage = ", ".join(f"{n} {b['usage_pct']:.0f}%" for n, b in s["buckets"].items() if b["usage_pct"] is not None) or "no usage headers"
+        return f"Graph rate limits: {s['calls']} calls, {s['waits']} waited ({s['wait_seconds']:.1f}s), {s['throttles']} throttled; {usage}"
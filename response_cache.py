@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
+
+import config
+
+# Parameters that never take part in a cache key
+_UNKEYED_PARAMS = {"access_token", "appsecret_proof"}
+
+
+def cache_key(url: str, params=None) -> str:
+    """Stable key for a GET: URL without query + sorted params, access token excluded."""
+    parts = urlsplit(url)
+    merged = dict(parse_qsl(parts.query))
+    merged.update({k: str(v) for k, v in (params or {}).items()})
+    items = sorted((k, v) for k, v in merged.items() if k not in _UNKEYED_PARAMS)
+    base = urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+    return hashlib.sha256(json.dumps([base, items]).encode("utf-8")).hexdigest()
+
+
+def endpoint_ttl(path: str, params=None) -> int:
+    """
+    TTL (seconds) for a Graph GET, by endpoint type: insights, media lists (incl. Business
+    Discovery pages) or profile metadata (node reads by numeric id or `?ids=`). Auth
+    endpoints, `me/...` (whose answer depends on the token, which is not in the key) and
+    any endpoint not recognised here are never cached (0).
+    """
+    segments = [s for s in urlsplit(path).path.split("/") if s]
+    if segments and re.fullmatch(r"v\d+(\.\d+)?", segments[0]):
+        segments = segments[1:]
+    params = params or {}
+    fields = str(params.get("fields", ""))
+    if not segments:
+        is_node = "ids" in params
+    elif segments[0] == "me" or "oauth" in segments[0] or segments[-1] == "debug_token":
+        return 0
+    else:
+        is_node = len(segments) == 1 and segments[0].isdigit()
+    if segments[-1:] == ["insights"] or (is_node and "insights" in fields):
+        return config.CACHE_TTL_INSIGHTS
+    if segments[-1:] in (["media"], ["children"]) or (is_node and "media" in fields.replace("media_", "")):
+        return config.CACHE_TTL_MEDIA
+    return config.CACHE_TTL_PROFILE if is_node else 0
+
+
+class ResponseCache:
+    """
+    SQLite-backed cache of decoded Graph responses.
+    Rows expire after their TTL; once the stored bodies exceed `max_bytes` the least
+    recently used rows are evicted. Hit/miss counters are kept for end-of-run reports.
+    """
+
+    def __init__(self, path: str | None = None, max_bytes: int | None = None):
+        self.path = path or os.path.join(config.CACHE_DIR, "graph_cache.sqlite3")
+        self.max_bytes = max_bytes or config.RESPONSE_CACHE_MAX_MB * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, body TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT body, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def skip(self):
+        """Count a lookup bypassed on purpose (refresh mode) as a miss."""
+        with self._lock:
+            self.misses += 1
+
+    def set(self, key: str, payload, ttl: int):
+        body = json.dumps(payload, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, body, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, body, len(body), now + ttl, now),
+            )
+            self._size += len(body) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now: float):
+        """Drop expired rows, then least recently used ones until under 90% of max_bytes."""
+        self._db.execute("DELETE FROM responses WHERE expires_at < ?", (now,))
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        target = self.max_bytes * 0.9
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if self._size <= target:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size -= size
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return f"Graph cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate)"
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,225 @@
+import email.utils
+import random
+import threading
+import time
+
+import requests
+
+import config
+from rate_limit import THROTTLE_CODES
+
+# HTTP statuses worth retrying: timeouts, throttling and server-side failures
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# Graph "unknown error" (1) and "service temporarily unavailable" (2); errors flagged is_transient are retried too
+GRAPH_TRANSIENT_CODES = {1, 2}
+_NETWORK_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError, ConnectionError, TimeoutError)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a service whose circuit breaker is open."""
+
+
+def parse_retry_after(value) -> float | None:
+    """Seconds to wait from a Retry-After header (delta-seconds or an HTTP date)."""
+    if value in (None, ""):
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _status(exc) -> int | None:
+    """HTTP status carried by a requests or google-genai exception, if any."""
+    for value in (getattr(exc, "code", None), getattr(exc, "status_code", None), getattr(getattr(exc, "response", None), "status_code", None)):
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def classify_exception(exc) -> tuple:
+    """(retryable, retry_after seconds or None) for an exception from a network call."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    retry_after = parse_retry_after(headers.get("retry-after") or headers.get("Retry-After"))
+    status = _status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS, retry_after
+    if isinstance(exc, _NETWORK_ERRORS) or "Timeout" in type(exc).__name__:
+        return True, retry_after
+    return False, None
+
+
+def too_much_data(payload) -> bool:
+    """
+    Graph's "Please reduce the amount of data you're asking for" (HTTP 500, code 1): the
+    caller has to ask for less, so repeating the same call cannot help.
+    """
+    err = payload.get("error") if isinstance(payload, dict) else None
+    return isinstance(err, dict) and "reduce the amount of data" in str(err.get("message", "")).lower()
+
+
+def classify_graph_result(result) -> tuple:
+    """
+    (retryable, retry_after) for a GraphClient (payload, headers) result. Throttling codes are
+    left to the RateLimitGovernor and data-volume errors to the caller (see too_much_data);
+    network failures are the errors without an HTTP status.
+    """
+    payload, headers = result
+    err = payload.get("error") if isinstance(payload, dict) else None
+    if not isinstance(err, dict) or err.get("code") in THROTTLE_CODES or too_much_data(payload):
+        return False, None
+    retryable = (
+        err.get("status") in RETRYABLE_STATUS
+        or err.get("code") in GRAPH_TRANSIENT_CODES
+        or bool(err.get("is_transient"))
+        or "status" not in err
+    )
+    return retryable, parse_retry_after((headers or {}).get("retry-after")) if retryable else None
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive retryable failures and rejects calls for `reset_after`
+    seconds; then lets one trial call through (half-open) and closes again on its success.
+    """
+
+    def __init__(self, threshold: int, reset_after: float):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._open_until = 0.0
+        self._trial = False
+        self.opened = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._failures < self.threshold:
+                return True
+            now = time.monotonic()
+            if now < self._open_until:
+                return False
+            # Half-open: this caller is the trial, everyone else waits for its outcome
+            self._open_until = now + self.reset_after
+            self._trial = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures == self.threshold or self._trial:
+                self._open_until = time.monotonic() + self.reset_after
+                self._trial = False
+                self.opened += 1
+
+
+class RetryPolicy:
+    """
+    Retries one kind of network call on transient failures: at most `attempts` attempts,
+    decorrelated-jitter backoff between `base` and `cap` seconds (or the server's
+    Retry-After, whichever is longer), and no new attempt once `deadline` seconds have
+    passed since the first. A CircuitBreaker shared by every call of the policy fails
+    fast while the service keeps failing. Counters feed `retry_stats()`.
+    """
+
+    def __init__(self, name: str, attempts=None, base=None, cap=None, deadline=None, breaker=None):
+        self.name = name
+        self.attempts = attempts or config.RETRY_ATTEMPTS
+        self.base = base or config.RETRY_BASE_DELAY
+        self.cap = cap or config.RETRY_MAX_DELAY
+        self.deadline = deadline or config.RETRY_DEADLINE
+        self.breaker = breaker or CircuitBreaker(config.RETRY_BREAKER_FAILURES, config.RETRY_BREAKER_RESET)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.gave_up = 0
+        self.rejected = 0
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def call(self, fn, *args, classify_result=None, deadline=None, label=None, **kwargs):
+        """
+        Call `fn(*args, **kwargs)`, retrying retryable exceptions (classify_exception) and
+        results `classify_result(result)` reports as retryable. When retries run out the last
+        exception is raised, or the last result returned. Raises CircuitOpenError while open.
+        Only retryable failures count toward the circuit breaker; anything classified as not
+        retryable (including errors the caller handles itself) counts as the service answering.
+        """
+        label = label or self.name
+        give_up_at = time.monotonic() + (deadline or self.deadline)
+        delay = self.base
+        self._count("calls")
+        for attempt in range(1, self.attempts + 1):
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise CircuitOpenError(f"{self.name} circuit open after repeated failures")
+            try:
+                result = fn(*args, **kwargs)
+                retryable, retry_after = classify_result(result) if classify_result else (False, None)
+                error = None
+            except Exception as e:
+                retryable, retry_after = classify_exception(e)
+                if not retryable:
+                    self.breaker.success()  # the service answered; the request itself was wrong
+                    raise
+                result, error = None, e
+            if not retryable:
+                self.breaker.success()
+                return result
+
+            self.breaker.failure()
+            delay = min(self.cap, random.uniform(self.base, delay * 3))
+            wait = max(delay, retry_after or 0.0)
+            if attempt == self.attempts or time.monotonic() + wait > give_up_at:
+                self._count("gave_up")
+                if error is not None:
+                    raise error
+                return result
+            self._count("retries")
+            reason = error if error is not None else "transient error"
+            print(f"🔁 {label}: attempt {attempt}/{self.attempts} failed ({reason}); retrying in {wait:.1f}s")
+            time.sleep(wait)
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "retries": self.retries, "gave_up": self.gave_up, "rejected": self.rejected, "breaker_opened": self.breaker.opened}
+
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+def get_policy(name: str) -> RetryPolicy:
+    """
+    Return the process-wide RetryPolicy for `name` ("graph", "download" or "gemini"),
+    with that service's deadline (RETRY_<NAME>_DEADLINE, falling back to RETRY_DEADLINE).
+    """
+    with _policies_lock:
+        if name not in _policies:
+            deadline = getattr(config, f"RETRY_{name.upper()}_DEADLINE", None)
+            _policies[name] = RetryPolicy(name, deadline=deadline)
+        return _policies[name]
+
+
+def retry_stats() -> dict:
+    """{policy name: counters} for every policy used in this process."""
+    with _policies_lock:
+        return {name: policy.stats() for name, policy in _policies.items()}
+
+
+def report() -> str:
+    stats = retry_stats()
+    if not stats:
+        return "🔁 Retries: no retried calls this session"
+    parts = [f"{name} {s['retries']} retries/{s['calls']} calls ({s['gave_up']} gave up, {s['rejected']} rejected)" for name, s in stats.items()]
+    return "🔁 Retries: " + ", ".join(parts)
@@ -0,0 +1,73 @@
+import json
+import threading
+from types import SimpleNamespace
+
+from analysis_cache import AnalysisCache
+from gemini_analysis import ANALYSIS_FIELDS, analyze_media, analyze_shard, item_key
+
+
+class StubModels:
+    """generate_content_stream that answers every item_id label in `contents`, in reverse order."""
+
+    def __init__(self, skip=()):
+        self.skip = set(skip)
+        self.called = threading.Event()
+
+    def generate_content_stream(self, model, contents, config):
+        self.called.set()
+        keys = [c.split(": ", 1)[1] for c in contents if isinstance(c, str) and c.startswith("item_id: ")]
+        entries = [{"item_id": key, **{field: f"{field} of {key}" for field in ANALYSIS_FIELDS}} for key in keys if key not in self.skip]
+        text = json.dumps(entries[::-1])
+        return [SimpleNamespace(text=text[i:i + 7]) for i in range(0, len(text), 7)]
+
+
+def test_files_of_one_post_get_one_entry_each():
+    shard = [
+        ("111", "111", "media/111.pdf", object()),
+        ("111", "111_2.mp4", "media/111_2.mp4", object()),
+        ("222", "222.jpg", "media/222.jpg", object()),
+    ]
+    seen = []
+    client = SimpleNamespace(models=StubModels(skip={item_key("222", "222.jpg")}))
+
+    entries = analyze_shard(client, shard, on_entry=seen.append)
+
+    assert [(e["media_id"], e["item_id"]) for e in entries] == [("111", "111:111"), ("111", "111:111_2.mp4"), ("222", "222:222.jpg")]
+    assert entries[0]["main_topic"] == "main_topic of 111:111"
+    assert entries[1]["main_topic"] == "main_topic of 111:111_2.mp4"
+    assert entries[2]["error"] == "missing from Gemini output"
+    assert len(seen) == 3
+
+
+def test_analysis_cache_keeps_every_file_of_a_post(tmp_path):
+    pdf, video = tmp_path / "111.pdf", tmp_path / "111_2.mp4"
+    pdf.write_bytes(b"slides")
+    video.write_bytes(b"video")
+    cache = AnalysisCache(path=str(tmp_path / "analysis_cache.json"), model="stub")
+    for path, group in ((pdf, "111"), (video, "111_2.mp4")):
+        key = item_key("111", group)
+        cache.put(key, str(path), {"media_id": "111", "item_id": key, "main_topic": group})
+    cache.save()
+
+    reloaded = AnalysisCache(path=str(tmp_path / "analysis_cache.json"), model="stub")
+    assert reloaded.get(item_key("111", "111"), str(pdf))["main_topic"] == "111"
+    assert reloaded.get(item_key("111", "111_2.mp4"), str(video))["main_topic"] == "111_2.mp4"
+    assert reloaded.get(item_key("111", "111"), str(video)) is None
+
+
+def test_full_shards_start_before_later_files_are_active(monkeypatch):
+    monkeypatch.setattr("gemini_analysis.config.GEMINI_SHARD_FILES", 2)
+    models = StubModels()
+    started_early = []
+
+    def activating():
+        yield "1", "1.jpg", "media/1.jpg", object()
+        yield "2", "2.jpg", "media/2.jpg", object()
+        started_early.append(models.called.wait(timeout=5))
+        yield "3", "3.jpg", "media/3.jpg", object()
+
+    entries = analyze_media(SimpleNamespace(models=models), activating(), "someone")
+
+    assert started_early == [True]
+    assert [e["media_id"] for e in entries] == ["1", "2", "3"]
+    assert all(e["username"] == "someone" for e in entries)
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from media_store import IncompleteDownloadError, MediaStore  # noqa: E402
+from retry import classify_exception  # noqa: E402
+from stub_server import start_stub_server  # noqa: E402
+
+SIZE = 200_000
+BODY = bytes(i % 251 for i in range(SIZE))
+
+
+class StreamClient:
+    """The one GraphClient method MediaStore uses, on a plain session."""
+
+    def __init__(self):
+        self.session = requests.Session()
+
+    def stream(self, url, timeout=10, headers=None):
+        return self.session.get(url, stream=True, timeout=timeout, headers=headers)
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(range_mode):
+        server, base_url = start_stub_server(range_mode=range_mode)
+        servers.append(server)
+        return f"{base_url}/cdn/1_{SIZE}.mp4"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def _fetch_with_part(tmp_path, url, part_bytes):
+    store = MediaStore(str(tmp_path))
+    (tmp_path / "1.mp4.part").write_bytes(part_bytes)
+    result = store.fetch(StreamClient(), url, "1", "1.mp4")
+    assert (tmp_path / "1.mp4").read_bytes() == BODY
+    assert not (tmp_path / "1.mp4.part").exists()
+    assert store.is_complete("1", "1.mp4", verify=True)
+    return result
+
+
+def test_resumes_part_file_with_range_request(tmp_path, serve):
+    result = _fetch_with_part(tmp_path, serve("honour"), BODY[:50_000])
+    assert result["resumed"]
+    assert result["bytes"] == SIZE - 50_000
+
+
+def test_misaligned_206_restarts_from_scratch(tmp_path, serve):
+    result = _fetch_with_part(tmp_path, serve("misaligned"), b"\xff" * 50_000)
+    assert not result["resumed"]
+    assert result["bytes"] == SIZE
+
+
+def test_200_reply_to_ranged_request_overwrites_part_file(tmp_path, serve):
+    result = _fetch_with_part(tmp_path, serve("ignore"), b"\xff" * 50_000)
+    assert not result["resumed"]
+    assert result["bytes"] == SIZE
+
+
+def test_truncated_download_is_retryable():
+    assert isinstance(IncompleteDownloadError("short"), IOError)
+    assert classify_exception(IncompleteDownloadError("short"))[0]
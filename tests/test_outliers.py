@@ -0,0 +1,25 @@
+import math
+
+import numpy as np
+
+from outliers import RollingBaseline, score_posts
+
+DAY = 86400
+
+
+def test_rolling_baseline_ignores_posts_without_timestamp():
+    baseline = RollingBaseline(window_days=1)
+    baseline.add(100.0, None)
+    baseline.add(100.0, math.nan)
+    for i in range(10):
+        baseline.add(10.0, i * 2 * DAY)
+    # Posts two days apart with a one-day window: only the latest one remains
+    assert len(baseline) == 1
+
+
+def test_score_posts_rolling_window_with_missing_timestamp():
+    records = [{"likes": 1000, "timestamp": None}]
+    records += [{"likes": 10, "timestamp": f"2025-01-{d:02d}T12:00:00+0000"} for d in range(1, 12)]
+    scores = score_posts(records, "likes", method="mean", window_days=1.5)
+    # Each dated post is compared with the previous day only, not with the undated 1000-like post
+    assert np.allclose(scores[2:], 1.0)
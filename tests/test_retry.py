@@ -0,0 +1,81 @@
+import re
+
+import business_discovery
+from graph_client import GraphClient
+from retry import CircuitBreaker, RetryPolicy, classify_graph_result
+
+REDUCE_DATA = {"error": {"message": "Please reduce the amount of data you're asking for, then retry your request", "code": 1, "status": 500}}
+
+
+class StubGraph(GraphClient):
+    """GraphClient whose HTTP layer serves 200 Business Discovery media and rejects pages over 20."""
+
+    def __init__(self, total=200, max_limit=20):
+        policy = RetryPolicy("test", attempts=5, base=0.001, cap=0.002, deadline=5, breaker=CircuitBreaker(8, 60))
+        super().__init__(retry=policy)
+        self.total = total
+        self.max_limit = max_limit
+        self.calls = 0
+        self.requested = []
+
+    def _request(self, method, path, params=None, data=None, access_token=None, timeout=None):
+        self.calls += 1
+        fields = params["fields"]
+        self.requested.append(fields)
+        limit = int(re.search(r"media\.limit\((\d+)\)", fields).group(1))
+        if limit > self.max_limit:
+            return REDUCE_DATA, {}
+        after = re.search(r"\.after\((\d+)\)", fields)
+        start = int(after.group(1)) if after else 0
+        end = min(self.total, start + limit)
+        media = {"data": [{"id": str(i), "like_count": i} for i in range(start, end)]}
+        if end < self.total:
+            media["paging"] = {"cursors": {"after": str(end)}}
+        return {"business_discovery": {"id": "42", "media": media}}, {}
+
+
+def test_reduce_data_error_is_not_retried():
+    assert classify_graph_result((REDUCE_DATA, {})) == (False, None)
+    transient = {"error": {"message": "An unknown error occurred", "code": 1, "status": 500}}
+    assert classify_graph_result((transient, {}))[0]
+
+
+def test_business_discovery_halves_without_retries_or_opening_the_breaker(monkeypatch):
+    graph = StubGraph()
+    monkeypatch.setattr(business_discovery, "get_client", lambda: graph)
+    monkeypatch.setattr(business_discovery, "_ceilings", {})
+    monkeypatch.setattr(business_discovery, "_page_limits", {})
+    monkeypatch.setattr(business_discovery.config, "BD_PAGE_SIZE", 100)
+
+    for _ in range(2):  # two profiles in one process share the breaker
+        _, media = business_discovery.get_ig_id_from_username_business_discovery("someone", "1", "token", n=200)
+        assert len(media) == 200
+
+    assert graph.retry.retries == 0
+    assert graph.retry.breaker.opened == 0
+    # First profile: 100 -> 50 -> 25 -> 12 rejected/halved, then 17 pages of <= 12; second reuses the learned size
+    assert graph.calls == 3 + 17 + 17
+
+
+def test_business_discovery_repeats_page_sizes_and_lets_the_ceiling_expire(monkeypatch):
+    graph = StubGraph(max_limit=100)
+    monkeypatch.setattr(business_discovery, "get_client", lambda: graph)
+    monkeypatch.setattr(business_discovery, "_ceilings", {business_discovery.BD_FULL_FIELDS: (20, 0.0)})
+    monkeypatch.setattr(business_discovery, "_page_limits", {})
+    monkeypatch.setattr(business_discovery.config, "BD_PAGE_SIZE", 10)
+    monkeypatch.setattr(business_discovery.config, "BD_MAX_PAGE_SIZE", 40)
+
+    # Slow pages: no growth, and the expired ceiling of 20 no longer applies
+    monkeypatch.setattr(business_discovery.config, "BD_FAST_SECONDS", 0.0)
+    business_discovery.get_ig_id_from_username_business_discovery("someone", "1", "token", n=100)
+    first = graph.requested[:]
+    assert len(first) == 10
+
+    # Fast pages would grow, but a repeated read asks for the same pages (same cache keys)
+    monkeypatch.setattr(business_discovery.config, "BD_FAST_SECONDS", 60.0)
+    business_discovery.get_ig_id_from_username_business_discovery("someone", "1", "token", n=100)
+    assert graph.requested[len(first):] == first
+
+    # Another profile starts from BD_PAGE_SIZE and grows up to BD_MAX_PAGE_SIZE: 10, 20, 40, 30
+    business_discovery.get_ig_id_from_username_business_discovery("other", "1", "token", n=100)
+    assert graph.calls == 2 * len(first) + 4